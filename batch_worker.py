@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+"""Run many command lines of a simulation script in a single, long-lived process.
+
+Each line of standard input holds the options of one run, as they would be written after the script's name in a shell
+(quotes work, # starts a comment); the script's main() runs them one after the other. Starting the interpreter and
+importing modules happens once instead of once per run, which dominates short runs (see startup_benchmark.py).
+
+Runs share the process: --seed reseeds the `random` module for each run as usual, but runs without a seed continue the
+previous run's random stream, and logging is configured by the first run that asks for it. A run with invalid options
+or that raises an exception is reported on standard error, and the worker goes on with the next line; the exit
+status is 1 if any run failed.
+
+Example:
+    for d in 1 2 5 10; do echo "--lambd 0.9 --d $d --n 10 --csv out.csv"; done | ./batch_worker.py queue_sim
+"""
+
+import argparse
+import importlib
+import shlex
+import sys
+import traceback
+
+# scripts whose main() accepts a list of arguments; sir.py isn't among them, as it shows a plot after every run
+SCRIPTS = ['queue_sim', 'weibull', 'weibull_preemptive_lifo2', 'storage', 'storage_region']
+
+
+def run_lines(main, lines):
+    """Call main(argv) for each non-empty line; return the number of runs that failed."""
+
+    failures = 0
+    for line_number, line in enumerate(lines, 1):
+        argv = shlex.split(line, comments=True)
+        if not argv:
+            continue
+        try:
+            main(argv)
+        except SystemExit as e:  # argparse errors, or an explicit sys.exit()
+            if e.code:
+                failures += 1
+                print(f"line {line_number}: run failed with status {e.code}: {line.strip()}", file=sys.stderr)
+        except Exception:
+            failures += 1
+            traceback.print_exc()
+            print(f"line {line_number}: run failed: {line.strip()}", file=sys.stderr)
+        sys.stdout.flush()  # results reach whoever reads them as soon as they are known
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('script', choices=SCRIPTS, help="script whose runs are read from standard input")
+    args = parser.parse_args()
+
+    script_main = importlib.import_module(args.script).main
+    sys.exit(1 if run_lines(script_main, sys.stdin) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Contact graphs for the SIR model, stored as compressed sparse row (CSR) adjacency arrays.
+
+The neighbours of node v are indices[indptr[v]:indptr[v + 1]]: with E undirected edges this takes 2E node ids (int32
+whenever possible) plus one int64 offset per node, so graphs with tens of millions of edges fit comfortably in memory,
+and sampling a random neighbour is O(1). Building the graph takes little more memory than the edges and the result:
+edge lists are parsed CHUNK lines at a time into int32 arrays, and a counting sort scatters the edges to their
+endpoints' lists a chunk at a time, without building 2E-long intermediate arrays.
+"""
+
+import random
+import warnings
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+CHUNK = 1 << 18  # edges parsed or sorted at once
+
+
+@dataclass(eq=False)
+class ContactNetwork:
+    """An undirected graph in CSR format."""
+
+    indptr: np.ndarray  # indptr[v] is the position in `indices` where v's neighbours start; it has n + 1 items
+    indices: np.ndarray  # neighbour ids, grouped by node
+
+    @property
+    def n(self):
+        """Number of nodes."""
+        return len(self.indptr) - 1
+
+    @classmethod
+    def from_edges(cls, sources, destinations, n=None):
+        """Build the graph from two arrays of node ids; each (source, destination) pair is an undirected edge.
+
+        Self-loops are dropped; duplicate edges are kept, making that neighbour more likely to be contacted.
+        """
+
+        sources, destinations = np.asarray(sources), np.asarray(destinations)
+        if n is None:
+            n = int(max(sources.max(initial=-1), destinations.max(initial=-1))) + 1
+        dtype = np.int32 if n <= np.iinfo(np.int32).max else np.int64
+
+        def chunks():
+            """The edges, CHUNK at a time and without self-loops, as two arrays of dtype."""
+            for start in range(0, len(sources), CHUNK):
+                chunk_sources = sources[start:start + CHUNK].astype(dtype, copy=False)
+                chunk_destinations = destinations[start:start + CHUNK].astype(dtype, copy=False)
+                keep = chunk_sources != chunk_destinations
+                yield chunk_sources[keep], chunk_destinations[keep]
+
+        # counting sort: every edge appears in the adjacency lists of both its endpoints, so the degrees give where
+        # each list starts; then edges are scattered there, first as sources and then as destinations, in order
+        degrees = np.zeros(n, dtype=np.int64)
+        for chunk in chunks():
+            for nodes in chunk:
+                counts = np.bincount(nodes)
+                degrees[:len(counts)] += counts
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        indices = np.empty(indptr[-1], dtype=dtype)
+        cursor = degrees  # reused: where the next neighbour of each node goes
+        cursor[:] = indptr[:-1]
+        for as_source in (True, False):
+            for chunk_sources, chunk_destinations in chunks():
+                if as_source:
+                    nodes, neighbours = chunk_sources, chunk_destinations
+                else:
+                    nodes, neighbours = chunk_destinations, chunk_sources
+                order = np.argsort(nodes, kind='stable')  # edges of each node together, within the chunk only
+                nodes = nodes[order]
+                firsts = np.flatnonzero(np.r_[True, nodes[1:] != nodes[:-1]])
+                counts = np.diff(np.r_[firsts, len(nodes)])
+                ranks = np.arange(len(nodes)) - np.repeat(firsts, counts)  # position among the node's edges here
+                indices[cursor[nodes] + ranks] = neighbours[order]
+                cursor[nodes[firsts]] += counts
+        return cls(indptr, indices)
+
+    @classmethod
+    def load(cls, path, n=None):
+        """Load a graph from a whitespace-separated edge list ('#' starts a comment), or from a .npz file written
+        by `save`, which is much faster for big graphs."""
+
+        if path.endswith('.npz'):
+            with np.load(path) as data:
+                return cls(data['indptr'], data['indices'])
+        sources, destinations = [], []
+        with open(path) as f, warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)  # loadtxt warns when the last chunk is empty
+            while True:
+                edges = np.loadtxt(f, dtype=np.int64, comments='#', usecols=(0, 1), ndmin=2, max_rows=CHUNK)
+                if edges.max(initial=0) <= np.iinfo(np.int32).max:
+                    edges = edges.astype(np.int32)
+                sources.append(edges[:, 0])
+                destinations.append(edges[:, 1])
+                if len(edges) < CHUNK:
+                    break
+        sources, destinations = np.concatenate(sources), np.concatenate(destinations)  # freeing the chunks
+        return cls.from_edges(sources, destinations, n)
+
+    def save(self, path):
+        """Save the CSR arrays to a .npz file that `load` can read back."""
+        np.savez(path, indptr=self.indptr, indices=self.indices)
+
+    def degree(self, node):
+        return int(self.indptr[node + 1] - self.indptr[node])
+
+    def random_neighbour(self, node, rng=random) -> Optional[int]:
+        """Return a neighbour of node chosen uniformly at random with rng, or None if node is isolated.
+
+        The network is never modified, so simulations running in parallel threads can share it."""
+
+        start, end = self.indptr[node], self.indptr[node + 1]
+        if start == end:
+            return None
+        return int(self.indices[start + int(rng.random() * (end - start))])
+
+
+if __name__ == '__main__':  # convert an edge list to the .npz format
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert an edge list to a CSR .npz file for sir.py --network")
+    parser.add_argument('edge_list')
+    parser.add_argument('output')
+    args = parser.parse_args()
+
+    network = ContactNetwork.load(args.edge_list)
+    network.save(args.output)
+    print(f"{network.n:,} nodes, {len(network.indices) // 2:,} edges")
@@ -1,5 +1,8 @@
 import logging
 import heapq
+import os
+import struct
+import time
 
 # TODO: implement the event queue!
 # suggestion: have a look at the heapq library (https://docs.python.org/dev/library/heapq.html)
@@ -8,7 +11,8 @@ import heapq
 class Simulation:
     """Subclass this to represent the simulation state.
 
-    Here, self.t is the simulated time and self.events is the event queue.
+    Here, self.t is the simulated time and self.events is the event queue. If self.trace is an `EventTrace`, every
+    processed event is recorded in it, except those that have a true `canceled` attribute. Periodic measurements can be registered with `add_sampler`.
     """
 
     def __init__(self):
@@ -20,27 +24,106 @@ class Simulation:
         self.t = 0  # simulated time
         # TODO: set up self.events as an empty queue
         self.events=[]
+        self.scheduled = 0  # number of events scheduled so far, used to break ties (see `Event.__lt__`)
+        self.trace = None
+        self.samplers = []  # [next sample time, interval, function] lists, see add_sampler
+        self.next_sample = float('inf')  # earliest next sample time among samplers
 
     def schedule(self, delay, event):
         """Add an event to the event queue after the required delay."""
 
         # TODO: add event to the queue at time self.t + delay
+        event.order = self.scheduled
+        self.scheduled += 1
         heapq.heappush(self.events,(self.t+delay,event))
         # self.events.put((self.t+delay,event))
 
-    def run(self, max_t=float('inf')):
-        """Run the simulation. If max_t is specified, stop it at that time."""
+    def add_sampler(self, interval, function, start=None):
+        """Call function(self) every interval of simulated time, from start (by default, now) on.
 
+        Samplers aren't events: `run` calls them when the next event goes past their sample times, so they don't fill
+        the event queue, and they see the state after all the events before their sample time. function returns
+        whether to keep sampling. Once no events are left, samplers are called until they stop (or until max_t), like
+        events that reschedule themselves would be.
+        """
+
+        start = self.t if start is None else start
+        self.samplers.append([start, interval, function])
+        self.next_sample = min(self.next_sample, start)
+
+    def sample_until(self, t):
+        """Call the samplers for all their sample times up to t, in time order."""
+
+        while self.samplers and self.next_sample <= t:
+            sampler = min(self.samplers, key=lambda s: s[0])
+            sample_time, interval, function = sampler
+            self.t = sample_time
+            if not function(self):
+                self.samplers.remove(sampler)
+            else:
+                sampler[0] = sample_time + interval
+            self.next_sample = min((s[0] for s in self.samplers), default=float('inf'))
+
+    def run(self, max_t=float('inf'), max_events=None, wall_time=None, until=None, check_every=1000):
+        """Run the simulation. If max_t is specified, stop it at that time.
+
+        The simulation can also stop after max_events events, after wall_time seconds of real time, or as soon as
+        until(self) returns True (e.g., once an estimate is precise enough). Apart from max_events, these conditions
+        are only checked every check_every events, so they cost next to nothing.
+
+        Return why the simulation stopped: 'empty' (no events left), 'max_t', 'max_events', 'wall_time' or 'until'.
+        The first event after max_t stays in the queue, so calling run again continues the simulation.
+        """
+
+        trace = self.trace
+        limit = float('inf') if max_events is None else max_events
+        deadline = None if wall_time is None else time.monotonic() + wall_time
+        check_every = check_every if deadline is not None or until is not None else float('inf')
+        processed = 0
+        next_check = min(check_every, limit)  # a single comparison per event when nothing needs checking
         while self.events:  # TODO: as long as the event queue is not empty:
             t, event = heapq.heappop(self.events) # TODO: get the first event from the queue
             # print(t)
+            if t >= self.next_sample:  # only a comparison per event when no sample is due
+                self.sample_until(min(t, max_t))
             if t > max_t:
-                break
+                heapq.heappush(self.events, (t, event))
+                return 'max_t'
             self.t = t
             event.process(self)
+            if trace is not None and not getattr(event, 'canceled', False):  # canceled events did nothing
+                trace.record(t, event, self)
+            processed += 1
+            if processed >= next_check:
+                if processed >= limit:
+                    return 'max_events'
+                if deadline is not None and time.monotonic() >= deadline:
+                    return 'wall_time'
+                if until is not None and until(self):
+                    return 'until'
+                next_check = min(processed + check_every, limit)
+        self.sample_until(max_t)  # no events left, the samplers may still have something to do
+        return 'empty'
+
+    @staticmethod
+    def log_enabled():
+        """Whether log_info messages are output; check it before computing expensive arguments."""
+
+        return logging.root.isEnabledFor(logging.INFO)
 
-    def log_info(self, msg):
-        logging.info(f'{self.t:.2f}: {msg}')
+    def log_info(self, msg, *args):
+        """Log msg % args with the current time, at the INFO level.
+
+        As with `logging.info`, formatting is deferred: if INFO messages are disabled, this returns right away, so
+        hot event handlers should pass arguments rather than building f-strings."""
+
+        if logging.root.isEnabledFor(logging.INFO):
+            logging.info('%s: ' + msg, self.format_time(), *args)
+
+    def format_time(self):
+        """How the current time appears in log messages; subclasses can override this."""
+
+        return f'{self.t:.2f}'
 
 
 class Event:
@@ -54,7 +137,70 @@ class Event:
     def process(self, sim: Simulation):
         raise NotImplementedError
 
+    def trace_payload(self, sim: Simulation):
+        """Two ints and a float describing this event in an `EventTrace`, e.g., the ids of the entities involved;
+        called after `process`. Override this to record something useful."""
+
+        return -1, -1, 0.0
+
     def __lt__(self, other):
-        """Method needed to break ties with events happening at the same time."""
+        """Method needed to break ties with events happening at the same time: the one scheduled first comes first,
+        so that runs with the same seed process events in the same order."""
+
+        return self.order < other.order
+
+
+class EventTrace:
+    """Binary trace of the events processed by a simulation, for analysis after the run (see trace_analysis.py).
+
+    Each event is a 26-byte little-endian record: its time (double), the code of its class (unsigned short) and the
+    payload returned by its `trace_payload` method, two ints and a double, recorded after the event is processed.
+    Records are packed into a preallocated buffer of `capacity` records, which is appended to the file whenever it
+    fills up, so tracing doesn't allocate anything per event. Class names are written to the file path + '.types',
+    one per line: the code is the line number, from 0.
+    """
 
-        return id(self) < id(other)
+    RECORD = struct.Struct('<dHiid')
+    DTYPE = [('t', '<f8'), ('type', '<u2'), ('a', '<i4'), ('b', '<i4'), ('value', '<f8')]  # same layout, for NumPy
+
+    def __init__(self, path, capacity=65536):
+        self.file = open(path, 'wb')
+        self.types_file = open(path + '.types', 'w')
+        self.codes = {}  # event class -> code
+        self.buffer = bytearray(capacity * self.RECORD.size)
+        self.offset = 0  # where the next record goes in buffer
+
+    def record(self, t, event, sim):
+        cls = type(event)
+        code = self.codes.get(cls)
+        if code is None:
+            code = self.codes[cls] = len(self.codes)
+            self.types_file.write(cls.__name__ + '\n')
+            self.types_file.flush()  # so that a partial trace can still be read
+        self.RECORD.pack_into(self.buffer, self.offset, t, code, *event.trace_payload(sim))
+        self.offset += self.RECORD.size
+        if self.offset == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        self.file.write(memoryview(self.buffer)[:self.offset])
+        self.file.flush()
+        self.offset = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.types_file.close()
+
+    @classmethod
+    def load(cls, path):
+        """Return the records of a trace as a memory-mapped NumPy structured array, and the list of event class
+        names (indexed by the type field)."""
+
+        import numpy as np
+
+        with open(path + '.types') as f:
+            names = f.read().splitlines()
+        if os.path.getsize(path) == 0:  # np.memmap can't map empty files
+            return np.zeros(0, dtype=cls.DTYPE), names
+        return np.memmap(path, dtype=cls.DTYPE, mode='r'), names
@@ -5,21 +5,21 @@ import configparser
 import logging
 import random
 from dataclasses import dataclass
-from random import expovariate
 from typing import Optional, List
 
 # the humanfriendly library (https://humanfriendly.readthedocs.io/en/latest/) lets us pass parameters in human-readable
 # format (e.g., "500 KiB" or "5 days"). You can safely remove this if you don't want to install it on your system, but
 # then you'll need to handle sizes in bytes and time spans in seconds--or write your own alternative.
 # It should be trivial to install (e.g., apt install python3-humanfriendly or conda/pip install humanfriendly).
-from humanfriendly import format_timespan, parse_size, parse_timespan
+# It is imported where it's used, so that importing this module stays fast and runs that don't read a configuration
+# file or log anything don't need it.
 
 from discrete_event_sim import Simulation, Event
 
 
-def exp_rv(mean):
-    """Return an exponential random variable with the given mean."""
-    return expovariate(1 / mean)
+def exp_rv(mean, rng=random):
+    """Return an exponential random variable with the given mean, drawn from rng."""
+    return rng.expovariate(1 / mean)
 
 
 class DataLost(Exception):
@@ -27,30 +27,92 @@ class DataLost(Exception):
     pass
 
 
+@dataclass
+class Link:
+    """Network characteristics of the path between two regions."""
+
+    latency: float  # time before a transfer starts moving data (in seconds)
+    bandwidth: float  # maximum throughput of the path (in bytes per second)
+
+    def transfer_time(self, size, speed):
+        """Time needed to move `size` bytes over this link when the endpoints can sustain `speed` bytes per second."""
+        return self.latency + size / min(speed, self.bandwidth)
+
+
+LOCAL_LINK = Link(0, float('inf'))  # nodes of the same region are only limited by their own speeds
+
+# placement policies: 'local' only backs up inside the node's region, 'nearest' also uses the other regions reachable
+# through a link, trying the cheapest ones (in terms of block transfer time) first
+PLACEMENTS = ['local', 'nearest']
+
+
 class Backup(Simulation):
     """Backup simulation.
     """
 
     # type annotations for `Node` are strings here to allow a forward declaration:
     # https://stackoverflow.com/questions/36193540/self-reference-or-forward-reference-of-type-annotations-in-python
-    def __init__(self, nodes: List['Node'],max_t,regions=[]):
+    def __init__(self, nodes: List['Node'],max_t,regions=[], links=None, placement='local', rng=None):
         super().__init__()  # call the __init__ method of parent class
+        # random.Random instance used for all random values; by default, the random module's shared one
+        self.rng = rng if rng is not None else random
         self.nodes = nodes
        
         self.max_t=max_t
         self.regions = regions  # Add regions tracking
         self.region_avg_hours={}
+        # used in event traces
+        self.node_ids = {node: i for i, node in enumerate(node for region in regions for node in region.nodes)}
+
+        # (source region name, destination region name) -> Link; pairs without a link can't exchange blocks
+        self.links: dict[tuple[str, str], Link] = links if links is not None else {}
+        assert placement in PLACEMENTS, f"unknown placement policy {placement}"
+        self.placement = placement
+        # upload_peers[region name] are the nodes that a node of that region may back up to, cheapest region first;
+        # download_peers[region name] are the nodes that may back up to a node of that region. Both are computed once
+        # here so that placement doesn't need to look at links while the simulation runs.
+        self.upload_peers, self.download_peers = self.build_candidates()
 
         for region in regions:
 
         # we add to the event queue the first event of each node going online and of failing
             for node in region.nodes:
                 self.schedule(node.arrival_time, Online(node))
-                self.schedule(node.arrival_time + exp_rv(node.average_lifetime), Fail(node))
+                self.schedule(node.arrival_time + exp_rv(node.average_lifetime, self.rng), Fail(node))
 
     def is_region_active(self, region, current_hour: int) -> bool:
         return current_hour % 24 in region.active_hours
 
+    def link(self, source, destination) -> Optional[Link]:
+        """Return the link between two regions, or None if blocks can't be transferred between them."""
+
+        if source is destination:
+            return LOCAL_LINK
+        return self.links.get((source.name, destination.name))
+
+    def build_candidates(self):
+        """Compute, for each region, the ordered lists of peers used by `Node.schedule_next_upload/download`.
+
+        Regions are ordered by the time needed to transfer one of the source region's blocks over the link.
+        """
+
+        allowed = []  # (cost, source, destination) for each pair of regions that can exchange blocks
+        for source in self.regions:
+            block_size = max((node.block_size for node in source.nodes), default=0)
+            for destination in self.regions:
+                link = self.link(source, destination)
+                if link is None or (self.placement == 'local' and source is not destination):
+                    continue
+                allowed.append((link.transfer_time(block_size, float('inf')), source, destination))
+        allowed.sort(key=lambda item: item[0])  # stable, so ties keep the configuration order
+
+        upload_peers = {region.name: [] for region in self.regions}
+        download_peers = {region.name: [] for region in self.regions}
+        for _, source, destination in allowed:
+            upload_peers[source.name].extend(destination.nodes)
+            download_peers[destination.name].extend(source.nodes)
+        return upload_peers, download_peers
+
     def schedule_transfer(self, uploader: 'Node', downloader: 'Node', block_id: int, restore: bool):
         """Helper function called by `Node.schedule_next_upload` and `Node.schedule_next_download`.
 
@@ -64,25 +126,26 @@ class Backup(Simulation):
         assert downloader.current_download is None
 
         speed = min(uploader.upload_speed, downloader.download_speed)  # we take the slowest between the two
-        delay = block_size / speed
+        link = self.link(uploader.region, downloader.region)
+        assert link is not None, f"no link between {uploader.region.name} and {downloader.region.name}"
+        delay = link.transfer_time(block_size, speed)
         if restore:
             event = BlockRestoreComplete(uploader, downloader, block_id)
         else:
             event = BlockBackupComplete(uploader, downloader, block_id)
-            logging.info(f"{format_timespan(self.t)}: pushed BlockBackupComplete from {uploader} to {downloader}")
+            self.log_info("pushed BlockBackupComplete from %s to %s", uploader, downloader)
         self.schedule(delay, event)
         uploader.current_upload = downloader.current_download = event
 
         # self.log_info(f"scheduled {event.__class__.__name__} from {uploader} to {downloader}"
         #               f" in {format_timespan(delay)}")
 
-    def log_info(self, msg):
-        """Override method to get human-friendly logging for time."""
-        hours = int(self.t // 3600)%24
-
-        logging.info(f'{format_timespan(self.t)} {hours}: {msg}')
+    def format_time(self):
+        """Override method to get human-friendly logging for time, with the hour of the day."""
+        from humanfriendly import format_timespan
 
-        # print(f'{format_timespan(self.t)}: {msg}')
+        hours = int(self.t // 3600)%24
+        return f'{format_timespan(self.t)} {hours}'
 
 
 @dataclass(eq=False) #???  # auto initialization from parameters below (won't consider two nodes with same state as equal)
@@ -187,12 +250,13 @@ class Node:
                 return
             # sim.log_info(f"{self} is looking for somebody to back up block {block_id}")
             remote_owners = set(node for node in self.backed_up_blocks if node is not None)  # nodes having one block
-            for peer in self.region.nodes:
+            for peer in sim.upload_peers[self.region.name]:
                 # if the peer is not self, is online, is not among the remote owners, has enough space and is not
                 # downloading anything currently, schedule the backup of block_id from self to peer
                 if (peer is not self and peer.online and peer not in remote_owners and peer.current_download is None
-                        and peer.free_space >= self.block_size):
-                    logging.info(f'{format_timespan(sim.t)}: schedule_next_upload from {self.name} to {peer.name}')
+                        and peer.free_space >= self.block_size
+                        and (peer.region is self.region or sim.is_region_active(peer.region, sim.t//3600))):
+                    sim.log_info("schedule_next_upload from %s to %s", self.name, peer.name)
 
                     sim.schedule_transfer(self, peer, block_id, restore=False)
                     return
@@ -214,12 +278,13 @@ class Node:
                     return  # we are done in this case
 
             # try to back up a block for a remote node
-            for peer in self.region.nodes:
+            for peer in sim.download_peers[self.region.name]:
                 if   (peer is not self and peer.online and peer.current_upload is None
-                    and self.free_space >= peer.block_size):
+                    and self.free_space >= peer.block_size
+                    and (peer.region is self.region or sim.is_region_active(peer.region, sim.t//3600))):
                     block_id = peer.find_block_to_back_up()
                     if block_id is not None:
-                        logging.info(f'{format_timespan(sim.t)}: schedule_next_download from {peer.name} to {self.name}')
+                        sim.log_info("schedule_next_download from %s to %s", peer.name, self.name)
                         sim.schedule_transfer(peer, self, block_id, restore=False)
                         return
 
@@ -246,6 +311,9 @@ class NodeEvent(Event):
         """Must be implemented by subclasses."""
         raise NotImplementedError
 
+    def trace_payload(self, sim):
+        return sim.node_ids[self.node], -1, 0.0
+
 
 class Online(NodeEvent):
     """A node goes online."""
@@ -259,7 +327,7 @@ class Online(NodeEvent):
         node.schedule_next_upload(sim)
         node.schedule_next_download(sim)
         # schedule the next offline event
-        sim.schedule(exp_rv(node.average_uptime), Offline(node))
+        sim.schedule(exp_rv(node.average_uptime, sim.rng), Offline(node))
 
 
 
@@ -269,10 +337,10 @@ class Recover(Online):
     def process(self, sim: Backup):
         node = self.node
         node.recover_t=sim.t
-        sim.log_info(f"{node} recovers")
+        sim.log_info("%s recovers", node)
         node.failed = False
         super().process(sim)
-        sim.schedule(exp_rv(node.average_lifetime), Fail(node))
+        sim.schedule(exp_rv(node.average_lifetime, sim.rng), Fail(node))
 
 
 class Disconnection(NodeEvent):
@@ -309,14 +377,14 @@ class Offline(Disconnection):
         assert node.online
         self.disconnect()
         # schedule the next online event
-        sim.schedule(exp_rv(self.node.average_downtime), Online(node))
+        sim.schedule(exp_rv(self.node.average_downtime, sim.rng), Online(node))
 
 
 class Fail(Disconnection):
     """A node fails and loses all local data."""
 
     def process(self, sim: Backup):
-        sim.log_info(f"{self.node} fails")
+        sim.log_info("%s fails", self.node)
         
         self.disconnect()
         node = self.node
@@ -336,7 +404,7 @@ class Fail(Disconnection):
         node.remote_blocks_held.clear()
         node.free_space = node.storage_size - node.block_size * node.n
         # schedule the next online and recover events
-        recover_time = exp_rv(node.average_recover_time)
+        recover_time = exp_rv(node.average_recover_time, sim.rng)
         sim.schedule(recover_time, Recover(node))
 
 
@@ -353,29 +421,44 @@ class TransferComplete(Event):
         assert self.uploader is not self.downloader
 
     def process(self, sim: Backup):
-        sim.log_info(f"{self.__class__.__name__} from {self.uploader} to {self.downloader}")
+        sim.log_info("%s from %s to %s", self.__class__.__name__, self.uploader, self.downloader)
         if self.canceled:
             return  # this transfer was canceled, so ignore this event
         uploader, downloader = self.uploader, self.downloader
         if uploader.current_upload is None or downloader.current_download is None: #???
+            self.canceled = True  # nothing was transferred, as far as traces are concerned
             return
         assert uploader.online and downloader.online
         self.update_block_state(sim)
         uploader.current_upload = downloader.current_download = None
         uploader.schedule_next_upload(sim)
         downloader.schedule_next_download(sim)
+        if not sim.log_enabled():
+            return  # don't count blocks for nothing
         for node in [uploader, downloader]:
-            sim.log_info(f"{node}: {sum(node.local_blocks)} local blocks, "
-                         f"{sum(peer is not None for peer in node.backed_up_blocks)} backed up blocks, "
-                         f"{len(node.remote_blocks_held)} remote blocks held")
+            sim.log_info("%s: %d local blocks, %d backed up blocks, %d remote blocks held",
+                         node, sum(node.local_blocks), sum(peer is not None for peer in node.backed_up_blocks),
+                         len(node.remote_blocks_held))
 
     def update_block_state(self,sim:Backup):
         """Needs to be specified by the subclasses, `BackupComplete` and `DownloadComplete`."""
         raise NotImplementedError
 
+    def owner(self) -> Node:
+        """The node whose block is transferred."""
+        raise NotImplementedError
+
+    def trace_payload(self, sim):
+        """Uploader and downloader ids, and the bytes transferred (0 if the transfer was canceled)."""
+        return (sim.node_ids[self.uploader], sim.node_ids[self.downloader],
+                0.0 if self.canceled else float(self.owner().block_size))
+
 
 class BlockBackupComplete(TransferComplete):
 
+    def owner(self):
+        return self.uploader
+
     def update_block_state(self,sim:Backup):
         owner, peer = self.uploader, self.downloader
         peer.free_space -= owner.block_size
@@ -386,22 +469,25 @@ class BlockBackupComplete(TransferComplete):
 
 max_t=-1
 class BlockRestoreComplete(TransferComplete):
+    def owner(self):
+        return self.downloader
+
     def update_block_state(self,sim:Backup):
         owner = self.downloader
         owner.local_blocks[self.block_id] = True
         if sum(owner.local_blocks) == owner.k:  # we have exactly k local blocks, we have all of them then
-            logging.info(f"{owner} has fully recovered its data.")
             x=sim.t-owner.recover_t
-            time=format_timespan(x)
-            ctime=format_timespan(sim.t)
             
             hours=x//3600
             if owner.region.name not in sim.region_avg_hours:
                 sim.region_avg_hours[owner.region.name]=[]
             
             sim.region_avg_hours[owner.region.name].append(hours)
-            logging.info(f"{ctime}: {owner} took {time} time to restore")
-            logging.info(f"{ctime}: {owner} has fully recovered its data.")
+            if sim.log_enabled():
+                from humanfriendly import format_timespan
+
+                sim.log_info("%s took %s time to restore", owner, format_timespan(x))
+                sim.log_info("%s has fully recovered its data.", owner)
 
 
 def main():
@@ -417,6 +503,8 @@ def main():
     if args.verbose:
         logging.basicConfig(format='{levelname}:{message}', level=logging.INFO, style='{')  # output info on stdout
 
+    from humanfriendly import parse_size, parse_timespan
+
     # functions to parse every parameter of peer configuration
     parsing_functions = [
         ('n', int), ('k', int),
@@ -439,7 +527,7 @@ def main():
     max_t=parse_timespan(args.max_t)
     sim = Backup(nodes,max_t)
     sim.run(max_t)
-    sim.log_info(f"Simulation over")
+    sim.log_info("Simulation over")
     
 
 
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+"""Regenerate the figures of part2.py, weibull_plots.py, weibull_lifo_preemptive_plots2.py and sir.py.
+
+Building a figure has two separate steps:
+  1. simulate: every curve is a task (a function from this module plus its keyword arguments); tasks whose results
+     aren't in the run cache (see run_cache.py) run in parallel, and their results are saved there, so they are
+     reused until the arguments or the simulator code change;
+  2. render: the figure is drawn from the results only, so changing the style doesn't run any simulation.
+
+Running this script uses matplotlib's Agg backend and writes files, so no display is needed:
+    figures.py part2 sir --format png svg
+"""
+
+import argparse
+import functools
+import importlib
+import multiprocessing
+import os
+import random
+
+from run_cache import RunCache
+
+MAX_QUEUE_LENGTH = 15
+
+# task function -> (module whose MODULES list says which simulator code its results depend on, other modules they
+# depend on); the task functions and MAX_QUEUE_LENGTH are in this module, so it is always among the latter
+TASK_MODULES = {'queue_fractions': ('queue_sim', ['figures', 'workloads']), 'sir_series': ('sir', ['figures'])}
+
+
+# -- simulations: module-level functions so that worker processes can run them; they return JSON-friendly values
+
+def queue_fractions(lambd, mu, n, d, max_t, shape=1, discipline='fifo', seed=0):
+    """Time-averaged fraction of queues with length >= x, for x in 0..MAX_QUEUE_LENGTH."""
+
+    from queue_sim import Queues
+    from workloads import distribution
+
+    sim = Queues(lambd, mu, n, d, distribution(shape), distribution(shape), discipline, random.Random(seed))
+    sim.run(max_t)
+    return sim.lengths.fractions(sim.t, MAX_QUEUE_LENGTH)
+
+
+def sir_series(population, infected, contact_rate, recovery_rate, plot_interval=1, engine='agent', seed=0):
+    """The s, i and r series of an epidemic."""
+
+    from sir import simulate
+
+    return [list(map(int, series)) for series in simulate(engine, population, infected, contact_rate, recovery_rate,
+                                                          plot_interval, rng=random.Random(seed))]
+
+
+def run_task(task):
+    """Run a (function name, kwargs) task."""
+
+    name, kwargs = task
+    return globals()[name](**kwargs)
+
+
+# -- figures: each one has a function returning its tasks as {key: (function name, kwargs)} and one drawing it
+
+def part2_tasks():
+    return {(d, lambd): ('queue_fractions', dict(lambd=lambd, mu=1, n=20, d=d, max_t=10_000))
+            for d in [1, 2, 5, 10] for lambd in [0.5, 0.9, 0.95, 0.99]}
+
+
+def part2_render(fig, results):
+    from mean_field import fixed_point
+
+    lambdas = sorted({lambd for _, lambd in results})
+    choices = sorted({d for d, _ in results})
+    theory = fixed_point(lambdas, choices, MAX_QUEUE_LENGTH)  # mean-field fractions, indexed by [lambd, d, x]
+    for idx, d in enumerate(choices):
+        ax = fig.add_subplot(2, 2, idx + 1)
+        for lambd_idx, lambd in enumerate(lambdas):
+            line, = ax.plot(range(MAX_QUEUE_LENGTH + 1), results[d, lambd], label=f"λ={lambd}")
+            ax.plot(range(MAX_QUEUE_LENGTH + 1), theory[lambd_idx, idx], linestyle='--', color=line.get_color(),
+                    label=f"λ={lambd} (mean-field)")
+        queue_axes(ax, f"{d} choices")
+    fig.suptitle("Theoretical vs. Simulated Queue Lengths for Various n Choices", fontsize=16, y=0.98)
+
+
+def weibull_tasks(discipline):
+    return {(lambd, shape): ('queue_fractions', dict(lambd=lambd, mu=1, n=10, d=1, max_t=1000, shape=shape,
+                                                     discipline=discipline))
+            for lambd in [0.5, 0.9, 0.95, 0.99] for shape in [0.5, 1, 4]}
+
+
+def weibull_render(fig, results, title):
+    lambdas = sorted({lambd for lambd, _ in results})
+    shapes = sorted({shape for _, shape in results})
+    for idx, lambd in enumerate(lambdas):
+        ax = fig.add_subplot(2, 2, idx + 1)
+        for shape in shapes:
+            ax.plot(range(MAX_QUEUE_LENGTH + 1), results[lambd, shape], label=f"shape = {shape}")
+        queue_axes(ax, f"lambda = {lambd}")
+    fig.suptitle(title, fontsize=16, y=0.98)
+
+
+def queue_axes(ax, title):
+    """Style shared by the subplots of the queue-length figures."""
+
+    ax.set_title(title)
+    ax.set_xlabel("Queue Length (x)")
+    ax.set_ylabel("Fraction of Queues with Size ≥ x")
+    ax.legend(loc="upper right")
+    ax.grid(True)
+
+
+def sir_tasks():
+    return {None: ('sir_series', dict(population=1000, infected=1, contact_rate=1, recovery_rate=1 / 3))}
+
+
+def sir_render(fig, results):
+    s, i, r = results[None]
+    ax = fig.add_subplot()
+    for label, series in ("Susceptible", s), ("Infected", i), ("Recovered", r):
+        ax.plot(range(len(series)), series, label=label)
+    ax.set_xlabel("Days")
+    ax.set_ylabel("Individuals")
+    ax.legend(loc=0)
+    ax.grid()
+
+
+# name -> (tasks, render function, figure size)
+FIGURES = {
+    'part2': (part2_tasks, part2_render, (18, 14)),
+    'weibull': (functools.partial(weibull_tasks, 'fifo'),
+                functools.partial(weibull_render,
+                                  title="Simulated Queue Lengths for Various Arrival Rates(Non preemptive FIFO)"),
+                (18, 14)),
+    'weibull-lifo': (functools.partial(weibull_tasks, 'lifo-pr'),
+                     functools.partial(weibull_render,
+                                       title="Simulated Queue Lengths for Various Arrival Rates (preemptive LIFO)"),
+                     (18, 14)),
+    'sir': (sir_tasks, sir_render, (6.4, 4.8)),
+}
+
+
+def task_key(cache, task):
+    """The run cache key of a task."""
+
+    name, kwargs = task
+    simulator, others = TASK_MODULES[name]
+    return cache.key(name, kwargs, importlib.import_module(simulator).MODULES + others)
+
+
+def simulate(names, processes=None, use_cache=True):
+    """Compute the results of all tasks of the given figures; return {figure name: {key: result}}."""
+
+    cache = RunCache()
+    tasks = {name: FIGURES[name][0]() for name in names}
+    unique = {task_key(cache, task): task for figure_tasks in tasks.values() for task in figure_tasks.values()}
+    results = {}
+    if use_cache:
+        for key in unique:
+            result = cache.get(key)
+            if result is not None:
+                results[key] = result
+    missing = [key for key in unique if key not in results]
+    if missing:
+        with multiprocessing.Pool(processes) as pool:
+            for key, result in zip(missing, pool.map(run_task, [unique[key] for key in missing])):
+                results[key] = result
+                cache.put(key, result)
+    return {name: {key: results[task_key(cache, task)] for key, task in figure_tasks.items()}
+            for name, figure_tasks in tasks.items()}
+
+
+def render(name, results):
+    """Draw a figure from its results and return it."""
+
+    from matplotlib import pyplot as plt
+
+    _, render_function, size = FIGURES[name]
+    fig = plt.figure(figsize=size)
+    render_function(fig, results)
+    if len(fig.axes) > 1:
+        fig.tight_layout(rect=[0, 0, 1, 0.97])
+        fig.subplots_adjust(hspace=0.4, wspace=0.3)
+    return fig
+
+
+def show(name):
+    """Simulate (or load from the cache) and display a figure interactively."""
+
+    from matplotlib import pyplot as plt
+
+    render(name, simulate([name])[name])
+    plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('figures', nargs='*', help=f"figures to build, among {', '.join(FIGURES)} (default: all)")
+    parser.add_argument('--format', nargs='+', default=['png'], help="output formats, e.g. png svg pdf")
+    parser.add_argument('--out-dir', default='figures', help="directory where figures are written")
+    parser.add_argument('--processes', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--no-cache', action='store_true', help="rerun all simulations")
+    args = parser.parse_args()
+    unknown = set(args.figures) - set(FIGURES)
+    if unknown:
+        parser.error(f"unknown figures: {', '.join(sorted(unknown))}")
+
+    import matplotlib
+    matplotlib.use('Agg')  # no display needed
+    from matplotlib import pyplot as plt
+
+    names = args.figures or list(FIGURES)
+    all_results = simulate(names, args.processes, not args.no_cache)
+    os.makedirs(args.out_dir, exist_ok=True)
+    for name in names:
+        fig = render(name, all_results[name])
+        for extension in args.format:
+            path = os.path.join(args.out_dir, f'{name}.{extension}')
+            fig.savefig(path)
+            print(f"wrote {path}")
+        plt.close(fig)
+
+
+if __name__ == '__main__':
+    main()
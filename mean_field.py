@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+"""Mean-field (n -> infinity) approximation of the supermarket model simulated by `queue_sim.Queues`.
+
+Let s[i] be the fraction of queues with at least i jobs (the running one included), so that s[0] = 1. When each job
+samples d queues and joins the shortest one, Mitzenmacher's "power of d choices" analysis gives
+
+    ds[i]/dt = lambd * (s[i - 1] ** d - s[i] ** d) - mu * (s[i] - s[i + 1])
+
+whose fixed point is s[i] = (lambd / mu) ** ((d ** i - 1) / (d - 1)), or (lambd / mu) ** i for d = 1.
+
+All functions are vectorized: they take sequences of lambdas and of d values and return arrays of shape
+(len(lambdas), len(ds), max_length + 1), so whole parameter grids are computed at once.
+"""
+
+import numpy as np
+
+
+def _grid(lambdas, ds, mu):
+    """Broadcastable (len(lambdas), 1, 1) and (1, len(ds), 1) arrays with the load and the choices."""
+
+    rho = np.asarray(lambdas, dtype=float).reshape(-1, 1, 1) / mu
+    d = np.asarray(ds, dtype=float).reshape(1, -1, 1)
+    return rho, d
+
+
+def fixed_point(lambdas, ds, max_length, mu=1):
+    """Stationary fraction of queues with at least i jobs, for i in 0..max_length."""
+
+    rho, d = _grid(lambdas, ds, mu)
+    i = np.arange(max_length + 1)
+    with np.errstate(over='ignore'):  # d ** i overflows to infinity for long queues, and then rho ** inf == 0
+        exponent = np.where(d == 1, i, (d ** i - 1) / np.where(d == 1, 2, d - 1))
+    return rho ** exponent
+
+
+def derivative(s, rho, d):
+    """Right-hand side of the ODE system, with time measured in units of 1 / mu; s[..., 0] stays at 1."""
+
+    powered = s ** d
+    result = np.zeros_like(s)
+    result[..., 1:] = rho * (powered[..., :-1] - powered[..., 1:]) - s[..., 1:]
+    result[..., 1:-1] += s[..., 2:]  # we truncate at max_length: s[max_length + 1] is taken as 0
+    return result
+
+
+def integrate(lambdas, ds, max_length, t, mu=1, dt=0.01, s0=None):
+    """Integrate the mean-field ODEs from s0 (by default, all queues empty) up to time t with fourth-order
+    Runge-Kutta steps of length about dt; return the state at time t."""
+
+    rho, d = _grid(lambdas, ds, mu)
+    if s0 is None:
+        s = np.zeros((rho.shape[0], d.shape[1], max_length + 1))
+        s[..., 0] = 1
+    else:
+        s = np.array(np.broadcast_to(s0, (rho.shape[0], d.shape[1], max_length + 1)), dtype=float)
+    steps = max(1, int(np.ceil(t * mu / dt)))
+    h = t * mu / steps  # the ODE is written in units of 1 / mu
+    for _ in range(steps):
+        k1 = derivative(s, rho, d)
+        k2 = derivative(s + h / 2 * k1, rho, d)
+        k3 = derivative(s + h / 2 * k2, rho, d)
+        k4 = derivative(s + h * k3, rho, d)
+        s += h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+    return s
+
+
+def expected_time(s, lambdas):
+    """Average time spent in the system (W) implied by the fractions s, through Little's law."""
+
+    return s[..., 1:].sum(axis=-1) / np.asarray(lambdas, dtype=float).reshape(-1, 1)
+
+
+if __name__ == '__main__':  # sanity check: the ODE converges to the fixed point, which for d=1 is an M/M/1 queue
+    lambdas = [0.5, 0.7, 0.9]
+    ds = [1, 2, 5, 10]
+
+    stationary = fixed_point(lambdas, ds, 200)
+    transient = integrate(lambdas, ds, 200, t=1000, dt=0.05)
+    print(f"max difference between ODE at t=1000 and fixed point: {np.abs(stationary - transient).max():.2e}")
+
+    lambdas.extend([0.95, 0.99])
+    stationary = fixed_point(lambdas, ds, 5000)  # long enough that truncation doesn't matter even for lambd=0.99
+    for lambd, ws in zip(lambdas, expected_time(stationary, lambdas)):
+        print(f"lambd={lambd}: W for d={ds}: {np.round(ws, 3)}; M/M/1 expectation: {1 / (1 - lambd):.3f}")
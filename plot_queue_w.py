@@ -3,50 +3,99 @@
 import argparse
 import collections
 import csv
-
-from matplotlib import pyplot as plt
+import statistics
+from typing import Optional
 
 from queue_sim import CSV_COLUMNS
+from results import ResultStore
 
 
 Row = collections.namedtuple('Row', CSV_COLUMNS)
 
-Params = collections.namedtuple('Params', 'mu max_t n d')
+Params = collections.namedtuple('Params', 'mu max_t n d shape discipline')
+
+# layouts of the 7-column rows written before the scripts shared CSV_COLUMNS: weibull.py wrote
+# lambd, mu, max_t, n, d, shape, w and weibull_preemptive_lifo2.py wrote lambd, mu, shape, n, d, max_t, w
+LEGACY_LAYOUTS = ['fifo', 'lifo']
+
+def parse_rows(reader: csv.reader, legacy_layout: str = 'fifo'):
+    """Parse the rows of the CSV file.
 
-def parse_rows(reader: csv.reader):
-    """Parse the rows of the CSV file."""
+    Rows written before queue_sim and weibull shared CSV_COLUMNS lack the discipline column, and those of queue_sim
+    the shape (exponential) too. Rows of the old scripts have the same length, so legacy_layout (see LEGACY_LAYOUTS)
+    tells whether 7-column rows come from weibull.py (FIFO) or weibull_preemptive_lifo2.py (preemptive LIFO)."""
 
+    if legacy_layout not in LEGACY_LAYOUTS:
+        raise ValueError(f"unknown legacy layout {legacy_layout}")
     for row in reader:
+        if not row:
+            continue
+        if len(row) == 6:
+            row = row[:5] + ['1', 'fifo'] + row[5:]
+        elif len(row) == 7 and legacy_layout == 'lifo':
+            lambd, mu, shape, n, d, max_t, w = row
+            row = [lambd, mu, max_t, n, d, shape, 'lifo-pr', w]
+        elif len(row) == 7:
+            row = row[:6] + ['fifo'] + row[6:]
         row = Row(*row)
         yield Row(lambd=float(row.lambd), mu=float(row.mu), max_t=float(row.max_t),
-                  n=int(row.n), d=int(row.d), w=float(row.w))
+                  n=int(row.n), d=int(row.d), shape=float(row.shape), discipline=row.discipline, w=float(row.w))
 
 
-def read_csv(filename: str, mu: list[float], max_t: list[float], n: list[int], d: list[int]) \
+def read_csv(filename: str, mu: list[float], max_t: Optional[list[float]], n: list[int], d: list[int],
+             shape: list[float] = (1,), discipline: list[str] = ('fifo',), legacy_layout: str = 'fifo') \
       -> dict[Params, list[tuple[float, float]]]:
     """Read the CSV file and return a dictionary with the data.
     
     Keys are the parameters of the simulation, values are lists of pairs with the lambda
-    and W values."""
+    and W values.
+
+    If filename ends in .db, it is read as a `results.ResultStore`, and only matching rows are loaded.
+
+    If max_t is None, runs of any length are put in the same curve, with max_t='scaled' in its parameters: this is
+    for adaptive sweeps, where each lambda is simulated for a different time (see queue_sweep.py).
+
+    legacy_layout is passed to `parse_rows`."""
 
     data = collections.defaultdict(list)
 
+    if filename.endswith('.db'):
+        store = ResultStore(filename)
+        filters = dict(mu=mu, n=n, d=d, shape=shape, discipline=discipline)
+        if max_t is not None:
+            filters['max_t'] = max_t
+        for row in store.query(**filters):
+            params = Params(row['mu'], row['max_t'] if max_t is not None else 'scaled', row['n'], row['d'],
+                            row['shape'], row['discipline'])
+            data[params].append((row['lambd'], row['w']))
+        store.close()
+        return data
+
     with open(filename, 'r') as f:
-        for row in parse_rows(csv.reader(f)):
-            if row.mu in mu and row.max_t in max_t and row.n in n and row.d in d:
-                data[Params(row.mu, row.max_t, row.n, row.d)].append((row.lambd, row.w))
+        for row in parse_rows(csv.reader(f), legacy_layout):
+            if (row.mu in mu and (max_t is None or row.max_t in max_t) and row.n in n and row.d in d
+                    and row.shape in shape and row.discipline in discipline):
+                data[Params(row.mu, row.max_t if max_t is not None else 'scaled', row.n, row.d, row.shape,
+                            row.discipline)].append((row.lambd, row.w))
     return data
 
 
 def plot(data: dict[Params, list[tuple[float, float]]], log_scale: bool):
-    """Plot the data in the dictionary."""
+    """Plot the data in the dictionary; W values of repeated runs with the same lambda are averaged."""
+
+    from matplotlib import pyplot as plt  # imported here, so that the functions above don't need matplotlib
 
     if log_scale:
         plt.yscale('log')
 
     for params, values in data.items():
-        lambdas, Ws = zip(*sorted(values))
-        plt.plot(lambdas, Ws, label=f'mu={params.mu}, max_t={params.max_t}, n={params.n}, d={params.d}')
+        by_lambda = collections.defaultdict(list)
+        for lambd, w in values:
+            by_lambda[lambd].append(w)
+        lambdas = sorted(by_lambda)
+        Ws = [statistics.fmean(by_lambda[lambd]) for lambd in lambdas]
+        plt.plot(lambdas, Ws, label=f'mu={params.mu}, max_t={params.max_t}, n={params.n}, d={params.d}, '
+                                    f'shape={params.shape}, {params.discipline}')
 
     plt.xlabel('lambda')
     plt.ylabel('W')
@@ -61,7 +110,7 @@ def main():
     You can specify multiple values for mu, max-t, n and d. The program will plot the W metric for
     all the combinations of these values that are present in the CSV file.
 
-    The CSV file must have the following columns: lambd, mu, max_t, n, d, w.
+    The CSV file must have the following columns: lambd, mu, max_t, n, d, shape, discipline, w.
 
     Example:
         plot_queue_w.py out.csv --max-t 100000 -d 1 2 5 10 -n 10
@@ -71,18 +120,27 @@ def main():
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
         description="Plot the W metric of an MMN queue from a CSV file, use lambda as x-axis.")
-    parser.add_argument('filename', help='name of the CSV file with the results')
+    parser.add_argument('filename', help='name of the CSV file (or .db results store) with the results')
     parser.add_argument('--mu', type=float, nargs='*', default=[1], help="service rate")
     parser.add_argument('--max-t', type=float, nargs='*', default=[1_000_000],
                         help="maximum time the simulation was run")
+    parser.add_argument('--scaled-max-t', action='store_true',
+                        help="ignore --max-t and plot runs of any length together, as in adaptive sweeps")
     parser.add_argument('--n', type=int, nargs='*', default=[1], help="number of servers")
     parser.add_argument('--d', type=int, nargs='*', default=[1], help="number of queues to sample")
+    parser.add_argument('--shape', type=float, nargs='*', default=[1], help="Weibull shape")
+    parser.add_argument('--discipline', nargs='*', default=['fifo'], help="scheduling discipline")
     parser.add_argument('--log-scale', action='store_true',
                         help="use a logarithmic scale for the y-axis")
+    parser.add_argument('--legacy-layout', choices=LEGACY_LAYOUTS, default='fifo',
+                        help="script that wrote 7-column rows: weibull.py (fifo) or weibull_preemptive_lifo2.py (lifo)")
     args = parser.parse_args()
 
-    data = read_csv(args.filename, args.mu, args.max_t, args.n, args.d)
+    data = read_csv(args.filename, args.mu, None if args.scaled_max_t else args.max_t, args.n, args.d, args.shape,
+                    args.discipline, args.legacy_layout)
     plot(data, args.log_scale)
+
+    from matplotlib import pyplot as plt
     plt.show()
 
 if __name__ == '__main__':
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+"""Compare the speed of the engines of `queue_sim` (see queue_sim.ENGINES) on the same seeded runs.
+
+Every engine runs each configuration with the same seed; the events and specialized engines must give exactly the same
+W, which is checked, while the vector engine gives a different sample of the same distribution.
+
+Example:
+    queue_benchmark.py --n 10 1000 --d 1 2 5 --max-t 2000
+"""
+
+import argparse
+import itertools
+import random
+import time
+
+from queue_sim import ENGINES, simulate
+
+
+def benchmark(lambd, mu, max_t, n, d, engines, seed, repeat=1):
+    """Return {engine: (W, best wall-clock time over repeat runs)} for a configuration."""
+
+    results = {}
+    for engine in engines:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            w = simulate(lambd, mu, max_t, n, d, rng=random.Random(seed), engine=engine)
+            best = min(best, time.perf_counter() - start)
+        results[engine] = w, best
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--lambd', type=float, nargs='+', default=[0.9], help="arrival rates")
+    parser.add_argument('--mu', type=float, default=1, help="service rate")
+    parser.add_argument('--max-t', type=float, default=2000, help="simulation length")
+    parser.add_argument('--n', type=int, nargs='+', default=[1, 10, 100], help="numbers of servers")
+    parser.add_argument('--d', type=int, nargs='+', default=[1, 2, 5], help="numbers of queues to sample")
+    parser.add_argument('--engines', choices=ENGINES, nargs='+', default=ENGINES)
+    parser.add_argument('--repeat', type=int, default=3, help="runs of each engine, of which the fastest counts")
+    parser.add_argument('--seed', default='0', help="random seed, the same for all runs")
+    args = parser.parse_args()
+
+    reference = args.engines[0]
+    print(f"speedups are relative to the {reference} engine")
+    for lambd, n, d in itertools.product(args.lambd, args.n, args.d):
+        if d > n:
+            continue
+        results = benchmark(lambd, args.mu, args.max_t, n, d, args.engines, args.seed, args.repeat)
+        reference_time = results[reference][1]
+        cells = []
+        for engine, (w, seconds) in results.items():
+            cells.append(f"{engine} W={w:.4f} {seconds:.2f}s (x{reference_time / seconds:.1f})")
+        print(f"lambd={lambd}, n={n}, d={d}: {', '.join(cells)}")
+        if {'events', 'specialized'} <= results.keys() and results['events'][0] != results['specialized'][0]:
+            raise AssertionError(f"the specialized engine doesn't match the events one: {results}")
+
+
+if __name__ == '__main__':
+    main()
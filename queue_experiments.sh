@@ -1,8 +1,8 @@
 #/bin/sh
 
-for LAMBD in 0.5 0.7 0.9 0.95 0.99; do
- for D in 1 2 5 10; do
-  echo $LAMBD $D
-  ./queue_sim.py --lambd $LAMBD --d $D --n 10 --csv out.csv --max-t 100_000
- done
-done
+# adaptive sweep (see queue_sweep.py): lambdas are added where W changes fastest or is least certain, and points close
+# to instability are simulated for longer; all points run in parallel and are stored in out.db (see results.py).
+# Common random numbers make the runs of different d see the same jobs, so their differences are measured precisely.
+# Import older CSV results with
+# ./results.py out.db out.csv
+./queue_sweep.py out.db --lambd 0.5 0.9 0.99 --d 1 2 5 10 --n 10 --max-t 10_000 --replications 3 --rounds 3 --crn common
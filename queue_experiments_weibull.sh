@@ -1,9 +1,8 @@
 #/bin/sh
 
+# all runs go through a single process (see batch_worker.py), which only starts Python and imports modules once
 for LAMBD in 0.5 0.7 0.9 0.95 0.99; do
- for D in 1 2 5 10; do
-        echo $LAMBD $D
-        ./weibull.py --lambd $LAMBD --d $D --n 10 --csv out_weibull.csv --max-t 100_000
+    for D in 1 2 5 10; do
+        echo "--lambd $LAMBD --d $D --n 10 --csv out_weibull.csv --max-t 100_000"
     done
- done
-done
+done | ./batch_worker.py weibull
@@ -1,3 +1,3 @@
 #!/bin/sh
 
-./plot_queue_w.py out.csv --n 10 --d 1 2 5 10 --max-t 100_000 --log-scale
\ No newline at end of file
+./plot_queue_w.py out.db --n 10 --d 1 2 5 10 --scaled-max-t --log-scale
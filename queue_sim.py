@@ -3,10 +3,17 @@
 import argparse
 import csv
 import collections
+import heapq
+import itertools
 import logging
-from random import expovariate, sample, seed
+import math
+import random
+import statistics
+import sys
 
-from discrete_event_sim import Simulation, Event
+from discrete_event_sim import Simulation, Event, EventTrace
+from scheduling import DISCIPLINES, Job
+from workloads import Exponential, distribution
 
 # One possible modification is to use a different distribution for job sizes or and/or interarrival times.
 # Weibull distributions (https://en.wikipedia.org/wiki/Weibull_distribution) are a generalization of the
@@ -21,8 +28,150 @@ from discrete_event_sim import Simulation, Event
 # and then call gen() every time you need a random variable
 
 
-# columns saved in the CSV file
-CSV_COLUMNS = ['lambd', 'mu', 'max_t', 'n', 'd', 'w']
+# modules whose code determines the results, used to invalidate cached runs (see run_cache.py)
+MODULES = ['queue_sim', 'scheduling', 'workloads', 'discrete_event_sim']
+
+# columns saved in the CSV file; shape is the Weibull shape of both interarrival and service times (1 = exponential)
+CSV_COLUMNS = ['lambd', 'mu', 'max_t', 'n', 'd', 'shape', 'discipline', 'w']
+
+# sources of randomness of `Queues` that get their own stream with common random numbers (see crn_streams)
+STREAMS = ['arrivals', 'services', 'routing']
+CRN_MODES = ['common', 'antithetic']
+
+# 'events' is `Queues`; 'specialized' is `SpecializedQueues` and 'vector' is `queue_vector.VectorQueues`, both for
+# exponential times and FIFO servers only
+ENGINES = ['events', 'specialized', 'vector']
+
+# tags of the events of `SpecializedQueues`
+ARRIVAL, COMPLETION = 0, 1
+
+
+class AntitheticRandom(random.Random):
+    """A generator whose random() returns 1 - u where `random.Random` with the same seed returns u.
+
+    Variates obtained by inversion (expovariate, weibullvariate) are then antithetic to the normal ones: a long
+    interarrival time in one run is a short one in the other.
+    """
+
+    def random(self):
+        u = super().random()
+        return 1.0 - u if u else u  # 1 - 0 would be out of [0, 1) and break expovariate
+
+
+def crn_streams(seed, antithetic=False):
+    """Common random numbers: one generator per source of randomness in `STREAMS`, seeded from seed and purpose.
+
+    Runs with the same seed see the same interarrival times and the same job sizes, whatever d, n or the discipline,
+    so differences between their results are due to the configurations and not to noise. With antithetic=True,
+    arrivals and services are antithetic to those of the normal streams (routing is unchanged).
+    """
+
+    streams = {}
+    for purpose in STREAMS:
+        factory = AntitheticRandom if antithetic and purpose != 'routing' else random.Random
+        streams[purpose] = factory(f'{seed}:{purpose}')
+    return streams
+
+
+def mix64(word, i):
+    """The i-th 64-bit word derived from word (the SplitMix64 output function), for `Queues.crn_queues`."""
+
+    z = (word + (i + 1) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return z ^ (z >> 31)
+
+
+class QueueLengthHistogram:
+    """Time-weighted distribution of the queue lengths in a `Queues` simulation.
+
+    count[x] is the number of queues currently holding x jobs (the running one included), and area[x] is the integral
+    of count[x] over time up to since[x]. Each event changes the length of a single queue, so updates are O(1).
+    """
+
+    def __init__(self, n):
+        self.count = [n]  # all queues start empty
+        self.area = [0.0]
+        self.since = [0.0]
+
+    def change(self, t, old, new):
+        """At time t, a queue went from length old to length new."""
+
+        count, area, since = self.count, self.area, self.since
+        if new == len(count):
+            count.append(0)
+            area.append(0.0)
+            since.append(t)
+        for x, delta in (old, -1), (new, 1):
+            area[x] += count[x] * (t - since[x])
+            since[x] = t
+            count[x] += delta
+
+    def fractions(self, t, max_length=None):
+        """Return a list whose x-th item is the fraction of queues with length >= x, averaged from time 0 to t.
+
+        If max_length is given, the list has exactly max_length + 1 items.
+        """
+
+        return tail_fractions([a + c * (t - s) for a, c, s in zip(self.area, self.count, self.since)], max_length)
+
+
+def tail_fractions(area, max_length=None):
+    """Turn area, where area[x] is the integral over time of the number of queues of length x, into the list of the
+    time-averaged fractions of queues with length >= x (see `QueueLengthHistogram.fractions`)."""
+
+    total = sum(area)  # equal to n * t
+    result = []
+    tail = 0.0
+    for a in reversed(area):
+        tail += a
+        result.append(tail / total)
+    result.reverse()
+    if max_length is not None:
+        result = result[:max_length + 1] + [0.0] * (max_length + 1 - len(result))
+    return result
+
+
+class Convergence:
+    """Stopping criterion for `Simulation.run(until=...)`: true once the 95% confidence interval of W, estimated with
+    batch means over the completed jobs, has a half-width of at most precision * W.
+
+    Response times are added to batches of batch_size consecutive jobs; when there are max_batches batches, pairs are
+    merged and the batch size doubles, so that batches stay long enough to be roughly independent.
+    """
+
+    def __init__(self, precision, batch_size=100, min_batches=20, max_batches=64):
+        self.precision = precision
+        self.batch_size = batch_size
+        self.min_batches = min_batches
+        self.max_batches = max_batches
+        self.batches = []  # sums of the response times of full batches
+        self.current, self.current_jobs = 0.0, 0  # batch being filled
+        self.seen = 0  # completed jobs already added
+
+    def add(self, response_time):
+        self.current += response_time
+        self.current_jobs += 1
+        if self.current_jobs == self.batch_size:
+            self.batches.append(self.current)
+            self.current, self.current_jobs = 0.0, 0
+            if len(self.batches) == self.max_batches:
+                self.batches = [a + b for a, b in zip(self.batches[::2], self.batches[1::2])]
+                self.batch_size *= 2
+
+    def __call__(self, sim: 'Queues'):
+        completions, arrivals = sim.completions, sim.arrivals
+        new = len(completions) - self.seen
+        self.seen = len(completions)
+        # dicts keep insertion order: the last `new` items are the jobs completed since the last call
+        recent = list(itertools.islice(reversed(completions.items()), new))
+        for job_id, completed in reversed(recent):
+            self.add(completed - arrivals[job_id])
+        if len(self.batches) < self.min_batches:
+            return False
+        means = [total / self.batch_size for total in self.batches]
+        mean = statistics.fmean(means)
+        return 1.96 * statistics.stdev(means) / math.sqrt(len(means)) <= self.precision * mean
 
 
 class Queues(Simulation):
@@ -31,13 +180,36 @@ class Queues(Simulation):
     The system has n servers with one queue each. Jobs arrive at rate lambd and are served at rate mu.
     When a job arrives, according to the supermarket model, it chooses d queues at random and joins
     the shortest one.
+
+    Interarrival and service times come from the `arrivals` and `services` distributions (see `workloads`), and each
+    server schedules its jobs according to `discipline`, one of `scheduling.DISCIPLINES`. Random values are drawn from
+    rng, a `random.Random` instance; by default the `random` module's shared generator is used, but simulations
+    running in parallel threads need their own. With streams (see `crn_streams`), arrivals, services and routing
+    decisions each have their own generator instead, every job gets its service time on arrival and chooses its queues
+    with `crn_queues`. Exponential times with FIFO
+    servers, by far the most common case, take a fast path that doesn't create `scheduling.Server` and `Job` objects.
     """
 
-    def __init__(self, lambd, mu, n, d):
+    def __init__(self, lambd, mu, n, d, arrivals=Exponential(), services=Exponential(), discipline='fifo',
+                 rng=None, streams=None):
         super().__init__()
-        self.running = [None] * n  # if not None, the id of the running job (per queue)
-        self.queues = [collections.deque() for _ in range(n)]  # FIFO queues of the system
-        # NOTE: we don't keep the running jobs in self.queues
+        if streams is not None:
+            self.rng = streams['routing']
+            arrivals_rng, services_rng = streams['arrivals'], streams['services']
+        else:
+            self.rng = rng if rng is not None else random
+            arrivals_rng = services_rng = self.rng
+        self.fast = (isinstance(arrivals, Exponential) and isinstance(services, Exponential)
+                     and discipline == 'fifo')
+        if self.fast:
+            self.running = [None] * n  # if not None, the id of the running job (per queue)
+            self.queues = [collections.deque() for _ in range(n)]  # FIFO queues of the system
+            # NOTE: we don't keep the running jobs in self.queues
+            self.servers = None
+        else:
+            self.servers = [DISCIPLINES[discipline]() for _ in range(n)]  # each one holds its own queue
+            for i, server in enumerate(self.servers):
+                server.index = i  # for server_payload
         self.arrivals = {}  # dictionary mapping job id to arrival time
         self.completions = {}  # dictionary mapping job id to completion time
         self.lambd = lambd
@@ -45,7 +217,32 @@ class Queues(Simulation):
         self.d = d
         self.mu = mu
         self.arrival_rate = lambd * n  # frequency of new jobs is proportional to the number of queues
-        self.schedule(expovariate(self.arrival_rate), Arrival(0))  # schedule the first arrival
+        self.lengths = QueueLengthHistogram(n)  # updated on every arrival and completion
+        self.gen_arrival = arrivals.generator(self.arrival_rate, arrivals_rng)
+        self.gen_service = services.generator(self.mu, services_rng)
+        # job id -> service time; with common random numbers the fast path draws service times on arrival (as the
+        # general one does), so that the k-th job gets the k-th value whatever the order in which jobs start
+        self.service_times = {} if streams is not None and self.fast else None
+        # with common random numbers, every job takes one 64-bit word to choose its queues, whatever d (see crn_queues)
+        self.crn_routing = streams is not None
+        self.schedule(self.gen_arrival(), Arrival(0))  # schedule the first arrival
+
+    def crn_queues(self):
+        """The d queues sampled by an arriving job with common random numbers.
+
+        They are the first d items of a random permutation of the queues. Each job draws a single 64-bit word, from
+        which the i-th step of the shuffle gets its own word (see `mix64`): runs with the same seed and a larger d sample
+        the same queues, plus some more, and stay in sync for later jobs."""
+
+        word = self.rng.getrandbits(64)
+        swapped = {}  # a lazy Fisher-Yates shuffle: position -> queue, where it isn't the identity
+        result = []
+        for i in range(self.d):
+            j = mix64(word, i) % (self.n - i)
+            last = self.n - i - 1
+            result.append(swapped.get(j, j))
+            swapped[j] = swapped.get(last, last)
+        return result
 
     def schedule_arrival(self, job_id):
         """Schedule the arrival of a new job."""
@@ -56,7 +253,7 @@ class Queues(Simulation):
         # memoryless behavior results in exponentially distributed times between arrivals (we use `expovariate`)
         # the rate of arrivals is proportional to the number of queues
 
-        self.schedule(expovariate(self.arrival_rate), Arrival(job_id))
+        self.schedule(self.gen_arrival(), Arrival(job_id))
 
     def schedule_completion(self, job_id, queue_index):  # TODO: complete this method
         """Schedule the completion of a job."""
@@ -64,13 +261,33 @@ class Queues(Simulation):
         # schedule the time of the completion event
         # check `schedule_arrival` for inspiration
         
-        self.schedule(expovariate(self.mu), Completion(job_id,queue_index))
+        service_time = self.gen_service() if self.service_times is None else self.service_times.pop(job_id)
+        self.schedule(service_time, Completion(job_id,queue_index))
+
+    def job_completed(self, server, job):
+        """Called by `scheduling.JobCompletion` once a server (not used in the fast path) is done with a job."""
+
+        self.completions[job.id] = self.t
+        length = len(server)
+        self.lengths.change(self.t, length + 1, length)
+
+    def queue_payload(self, i):
+        """Payload of queue events in an `EventTrace`: the queue index, its length and the jobs in the system."""
+
+        return i, self.queue_len(i), float(len(self.arrivals) - len(self.completions))
+
+    def server_payload(self, server):
+        """Payload of `scheduling.JobCompletion` events in an `EventTrace`."""
+
+        return self.queue_payload(server.index)
 
     def queue_len(self, i):
         """Return the length of the i-th queue.
         
         Notice that the currently running job is counted even if it is not in self.queues[i]."""
 
+        if self.servers is not None:
+            return len(self.servers[i])
         return (self.running[i] is not None) + len(self.queues[i])
 
 
@@ -82,8 +299,10 @@ class Arrival(Event):
 
     def process(self, sim: Queues):  # TODO: complete this method
         sim.arrivals[self.id] = sim.t  # set the arrival time of the job
-        sample_queues = sample(range(sim.n), sim.d)  # sample the id of d queues at random
+        # sample the id of d queues at random
+        sample_queues = sim.crn_queues() if sim.crn_routing else sim.rng.sample(range(sim.n), sim.d)
         queue_index = min(sample_queues, key=sim.queue_len)  # shortest queue among the sampled ones
+        self.queue_index = queue_index  # for trace_payload
         # check the key argument of the min built-in function:
         # https://docs.python.org/3/library/functions.html#min
 
@@ -96,16 +315,26 @@ class Arrival(Event):
         # schedule the arrival of the next job
 
         # if you are looking for inspiration, check the `Completion` class below
-        if sim.running[queue_index] is not None:  # queue is not empty
+        length = sim.queue_len(queue_index)
+        sim.lengths.change(sim.t, length, length + 1)
+        if sim.service_times is not None:
+            sim.service_times[self.id] = sim.gen_service()
+        if sim.servers is not None:  # general case, the server's discipline decides what runs
+            service_time = sim.gen_service()
+            sim.servers[queue_index].arrive(sim, Job(self.id, service_time, service_time))
+        elif sim.running[queue_index] is not None:  # queue is not empty
             sim.queues[queue_index].append(self.id)            
         else:
             sim.running[queue_index] = self.id  # no job is running on the queue
             sim.schedule_completion(self.id,queue_index)
         sim.schedule_arrival(self.id+1)  # schedule its completion
 
+    def trace_payload(self, sim: Queues):
+        return sim.queue_payload(self.queue_index)
+
 
 class Completion(Event):
-    """Job completion."""
+    """Job completion (fast path only, otherwise `scheduling.JobCompletion` is used)."""
 
     def __init__(self, job_id, queue_index):
         self.job_id = job_id  # currently unused, might be useful when extending
@@ -115,6 +344,8 @@ class Completion(Event):
         queue_index = self.queue_index
         assert sim.running[queue_index] == self.job_id  # the job must be the one running
         sim.completions[self.job_id] = sim.t
+        length = sim.queue_len(queue_index)
+        sim.lengths.change(sim.t, length, length - 1)
         queue = sim.queues[queue_index]
         if queue:  # queue is not empty
             sim.running[queue_index] = new_job_id = queue.popleft()  # assign the first job in the queue
@@ -122,28 +353,189 @@ class Completion(Event):
         else:
             sim.running[queue_index] = None  # no job is running on the queue
 
+    def trace_payload(self, sim: Queues):
+        return sim.queue_payload(self.queue_index)
+
+
+class SpecializedQueues(Queues):
+    """`Queues` with exponential times and FIFO servers, with a `run` specialized for them.
+
+    The event loop and the code of `Arrival` and `Completion` are merged in a single function, where the heap
+    functions, the random generator's methods and the state of the simulation are bound to local variables. Events are
+    (time, tag, job id, queue index) tuples rather than objects, with tag ARRIVAL or COMPLETION. Random values are drawn
+    in the same order as in `Queues`, so a seeded run gives the same results (queue-length histogram included), about
+    1.5 to 2 times faster; see queue_benchmark.py. Traces, samplers and stopping conditions other than max_t and
+    max_events aren't supported; common random numbers (streams) aren't either.
+    """
+
+    def __init__(self, lambd, mu, n, d, rng=None):
+        super().__init__(lambd, mu, n, d, rng=rng)
+        self.events = [(t, ARRIVAL, event.id, -1) for t, event in self.events]  # the first arrival
+
+    def run(self, max_t=math.inf, max_events=None):
+        """Run the simulation up to max_t, or for max_events events; return why it stopped, as `Simulation.run`."""
+
+        events, heappush, heappop = self.events, heapq.heappush, heapq.heappop
+        expovariate, sample, randrange = self.rng.expovariate, self.rng.sample, self.rng.randrange
+        arrival_rate, mu, n, d = self.arrival_rate, self.mu, self.n, self.d
+        population = range(n)
+        running, queues = self.running, self.queues
+        lengths = [self.queue_len(i) for i in population]
+        arrivals, completions = self.arrivals, self.completions
+        count, area, since = self.lengths.count, self.lengths.area, self.lengths.since
+        remaining = math.inf if max_events is None else max_events
+        now, reason = self.t, 'empty'
+        while events:
+            if not remaining:
+                reason = 'max_events'
+                break
+            remaining -= 1
+            event = heappop(events)
+            t, tag, job_id, queue_index = event
+            if t > max_t:
+                heappush(events, event)
+                reason = 'max_t'
+                break
+            now = t
+            if tag == ARRIVAL:
+                arrivals[job_id] = t
+                if d == 1:  # sample(range(n), 1) draws a single randrange(n), and is much slower
+                    queue_index = randrange(n)
+                else:
+                    queue_index = min(sample(population, d), key=lengths.__getitem__)
+                old = lengths[queue_index]
+                new = lengths[queue_index] = old + 1
+                if new == len(count):
+                    count.append(0)
+                    area.append(0.0)
+                    since.append(t)
+            else:
+                completions[job_id] = t
+                old = lengths[queue_index]
+                new = lengths[queue_index] = old - 1
+            # QueueLengthHistogram.change(t, old, new)
+            area[old] += count[old] * (t - since[old])
+            since[old] = t
+            count[old] -= 1
+            area[new] += count[new] * (t - since[new])
+            since[new] = t
+            count[new] += 1
+            if tag == ARRIVAL:
+                if running[queue_index] is not None:
+                    queues[queue_index].append(job_id)
+                else:
+                    running[queue_index] = job_id
+                    heappush(events, (t + expovariate(mu), COMPLETION, job_id, queue_index))
+                heappush(events, (t + expovariate(arrival_rate), ARRIVAL, job_id + 1, -1))
+            else:
+                queue = queues[queue_index]
+                if queue:
+                    running[queue_index] = next_job = queue.popleft()
+                    heappush(events, (t + expovariate(mu), COMPLETION, next_job, queue_index))
+                else:
+                    running[queue_index] = None
+        self.t = now
+        return reason
+
+
+def simulate(lambd, mu, max_t, n, d, shape=1, discipline='fifo', trace=None, precision=None, max_events=None,
+             wall_time=None, rng=None, streams=None, engine='events'):
+    """Run one simulation and return W, the average time spent in the system by completed jobs; rng and streams are
+    passed to `Queues`.
+
+    If trace is a file name, all events are recorded there (see `discrete_event_sim.EventTrace`). The simulation stops
+    before max_t if W is known with the given relative precision (see `Convergence`), or after max_events events or
+    wall_time seconds. With engine='specialized', `SpecializedQueues` gives the same results faster, for exponential
+    times and FIFO servers, without traces, precision or wall_time. With engine='vector', `queue_vector` runs the
+    simulation instead, which has the same restrictions and only stops at max_t."""
+
+    if engine == 'vector':
+        if shape != 1 or discipline != 'fifo' or trace or precision or max_events or wall_time or streams:
+            raise ValueError("the vector engine only supports exponential times, FIFO servers and stopping at max_t")
+        import queue_vector
+        return queue_vector.simulate(lambd, mu, max_t, n, d, rng)
+    if engine == 'specialized':
+        if shape != 1 or discipline != 'fifo' or trace or precision or wall_time or streams:
+            raise ValueError("the specialized engine only supports exponential times, FIFO servers and stopping at "
+                             "max_t or after max_events")
+        sim = SpecializedQueues(lambd, mu, n, d, rng)
+        reason = sim.run(max_t, max_events)
+    else:
+        sim = Queues(lambd, mu, n, d, distribution(shape), distribution(shape), discipline, rng, streams)
+        if trace is not None:
+            sim.trace = EventTrace(trace)
+        until = Convergence(precision) if precision is not None else None
+        reason = sim.run(max_t, max_events, wall_time, until, check_every=10_000)
+    logging.info(f"simulation stopped at time {sim.t:.2f} ({reason})")
+    if trace is not None:
+        sim.trace.close()
+    completions = sim.completions
+    return ((sum(completions.values()) - sum(sim.arrivals[job_id] for job_id in completions))
+            / len(completions))
+
+
+def seeded_simulate(seed_value, params, cache=None, crn=None, engine='events'):
+    """Return simulate(*params, engine=engine) with a random generator seeded with seed_value, going through cache
+    (a `RunCache`) if given. With crn, one of `CRN_MODES`, the run uses common random numbers (see `crn_streams`)
+    instead.
+
+    params are the values of CSV_COLUMNS[:-1]."""
+
+    def run():
+        if crn is None:
+            return {'w': simulate(*params, rng=random.Random(seed_value), engine=engine)}
+        return {'w': simulate(*params, streams=crn_streams(seed_value, crn == 'antithetic'), engine=engine)}
+
+    if cache is None:
+        return run()['w']
+    key_params = dict(zip(CSV_COLUMNS, params), seed=seed_value)
+    if crn is not None:
+        key_params['crn'] = crn
+    modules = MODULES
+    if engine == 'vector':  # the specialized engine gives the same results as the events one
+        key_params['engine'] = engine
+        modules = MODULES + ['queue_vector']
+    return cache.run('queue_sim', key_params, modules, run)['w']
+
+
+def main(argv=None, **defaults):
+    """Command-line entry point, for the arguments in argv (by default, sys.argv[1:]); `defaults` override the default
+    values of the options (see `weibull.py`)."""
 
-def main():
     parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument('--lambd', type=float, default=0.7, help="arrival rate")
     parser.add_argument('--mu', type=float, default=1, help="service rate")
     parser.add_argument('--max-t', type=float, default=1_000_000, help="maximum time to run the simulation")
     parser.add_argument('--n', type=int, default=1, help="number of servers")
     parser.add_argument('--d', type=int, default=1, help="number of queues to sample")
+    parser.add_argument('--shape', type=float, default=1,
+                        help="Weibull shape of interarrival and service times (1 is exponential)")
+    parser.add_argument('--discipline', choices=DISCIPLINES, default='fifo', help="scheduling at each server")
     parser.add_argument('--csv', help="CSV file in which to store results")
+    parser.add_argument('--db', help="results database (see results.py) in which to store results")
     parser.add_argument("--seed", help="random seed")
     parser.add_argument("--verbose", action='store_true')
-    args = parser.parse_args()
+    parser.add_argument("--no-cache", action='store_true', help="don't reuse results of identical seeded runs")
+    parser.add_argument("--trace", help="write a binary trace of all events to this file (see trace_analysis.py)")
+    parser.add_argument("--precision", type=float,
+                        help="stop when the 95%% confidence interval of W is within this fraction of W, e.g. 0.01")
+    parser.add_argument("--max-events", type=int, help="stop after this many events")
+    parser.add_argument("--wall-time", type=float, help="stop after this many seconds of real time")
+    parser.add_argument("--engine", choices=ENGINES, default='events',
+                        help="'specialized' gives the same results faster, 'vector' is much faster with many "
+                             "servers (see queue_vector.py); both only support exponential times (shape 1) and FIFO")
+    parser.set_defaults(**defaults)
+    args = parser.parse_args(argv)
 
     params = [getattr(args, column) for column in CSV_COLUMNS[:-1]]
-    # corresponds to params = [args.lambd, args.mu, args.max_t, args.n, args.d]
+    # corresponds to params = [args.lambd, args.mu, args.max_t, args.n, args.d, args.shape, args.discipline]
 
-    if any(x <= 0 for x in params):
-        logging.error("lambd, mu, max-t, n and d must all be positive")
-        exit(1)
+    if any(x <= 0 for x in params[:-1]):
+        logging.error("lambd, mu, max-t, n, d and shape must all be positive")
+        sys.exit(1)  # the exit() builtin would also close stdin, which batch_worker.py reads
 
     if args.seed:
-        seed(args.seed)  # set a seed to make experiments repeatable
+        random.seed(args.seed)  # set a seed to make experiments repeatable
     if args.verbose:
         # output info on stderr
         logging.basicConfig(format='{levelname}:{message}', level=logging.INFO, style='{')
@@ -151,12 +543,20 @@ def main():
     if args.lambd >= args.mu:
         logging.warning("The system is unstable: lambda >= mu")
 
-    sim = Queues(args.lambd, args.mu, args.n, args.d)
-    sim.run(args.max_t)
-
-    completions = sim.completions
-    W = ((sum(completions.values()) - sum(sim.arrivals[job_id] for job_id in completions))
-         / len(completions))
+    stopping = dict(precision=args.precision, max_events=args.max_events, wall_time=args.wall_time)
+    if args.engine == 'vector' and (args.shape != 1 or args.discipline != 'fifo' or args.trace
+                                    or any(stopping.values())):
+        parser.error("the vector engine only supports --shape 1, --discipline fifo and stopping at --max-t")
+    if args.engine == 'specialized' and (args.shape != 1 or args.discipline != 'fifo' or args.trace
+                                         or args.precision or args.wall_time):
+        parser.error("the specialized engine only supports --shape 1, --discipline fifo and stopping at --max-t or "
+                     "--max-events")
+    if args.seed and not (args.no_cache or args.trace or any(stopping.values())):
+        from run_cache import RunCache
+
+        W = seeded_simulate(args.seed, params, RunCache(), engine=args.engine)
+    else:
+        W = simulate(*params, trace=args.trace, **stopping, engine=args.engine)
     print(f"Average time spent in the system: {W}")
     if args.mu == 1 and args.lambd != 1:
         print(f"Theoretical expectation for random server choice (d=1): {1 / (1 - args.lambd)}")
@@ -165,6 +565,12 @@ def main():
         with open(args.csv, 'a', newline='') as f:
             writer = csv.writer(f)
             writer.writerow(params + [W])
+    if args.db is not None:
+        from results import ResultStore  # sqlite3 and subprocess are slow to import, and seldom needed
+
+        store = ResultStore(args.db)
+        store.add([dict(zip(CSV_COLUMNS, params + [W]), seed=args.seed, engine=args.engine)])
+        store.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+"""Run `queue_sim` over a grid of parameters in parallel and store all the results at once.
+
+Example:
+    queue_sweep.py out.db --lambd 0.5 0.7 0.9 0.95 0.99 --d 1 2 5 10 --n 10 --max-t 100_000
+
+With --rounds, the sweep is adaptive (this is what queue_experiments.sh does): the --lambd values are only a coarse
+starting grid for each curve (i.e., each combination of the other parameters). After each round, the --refine
+intervals between consecutive lambdas where linear interpolation of W is least trustworthy get a new point in the
+middle; this is judged on the curvature of log W and on the confidence interval of W over the replications. Each
+point is also simulated for `relaxations` times the relaxation time 1 / (mu (1 - rho)^2) of an M/M/1 queue with load
+rho, and at least --max-t: short runs where W is flat, long ones close to instability.
+
+With --crn, runs use common random numbers (see `queue_sim.crn_streams`): replication r of every point has the same
+seed, and hence the same arrivals and job sizes, so comparing policies (e.g., values of d) isn't swamped by noise. At
+the end, the difference between the W of each d and of the smallest one is printed with its confidence interval, next
+to the one that independent runs would give. With --crn antithetic, replications 2i and 2i + 1 are an antithetic
+pair, averaged before computing confidence intervals.
+"""
+
+import argparse
+import itertools
+import math
+import multiprocessing
+import statistics
+
+from queue_sim import CRN_MODES, CSV_COLUMNS, ENGINES, seeded_simulate
+from results import ResultStore
+from run_cache import RunCache
+from scheduling import DISCIPLINES
+
+# parameters that can take several values in a sweep, in the order simulate() wants them
+GRID_COLUMNS = CSV_COLUMNS[:-1]
+
+Z_95 = 1.96  # for 95% confidence intervals
+
+
+def run_seed(args, replication, point_id):
+    """Seed and common random numbers mode (see `queue_sim.seeded_simulate`) of a replication of a point; point_id
+    tells points apart, unless they share random numbers."""
+
+    if args.crn is None:
+        return f'{args.seed}-{replication}-{point_id}', None
+    if args.crn == 'antithetic':
+        return f'{args.seed}-{replication // 2}', 'antithetic' if replication % 2 else 'common'
+    return f'{args.seed}-{replication}', 'common'
+
+
+def row_seed(seed, crn):
+    """The seed stored in the results of a run, which tells the two runs of an antithetic pair apart."""
+
+    return f'{seed}-antithetic' if crn == 'antithetic' else seed
+
+
+def run_point(point):
+    """Run the simulation for a (seed, params, use_cache, crn, engine) tuple and return the row to store; used with
+    `Pool.imap_unordered`. Points already computed by an identical run are taken from the cache."""
+
+    seed, params, use_cache, crn, engine = point
+    w = seeded_simulate(seed, params, RunCache() if use_cache else None, crn, engine)
+    return dict(zip(GRID_COLUMNS, params), seed=row_seed(seed, crn), engine=engine, w=w)
+
+
+def run_indexed_point(item):
+    """`run_point` for an (index, point) pair, returning (index, row): `Pool.imap_unordered` loses the order."""
+
+    index, point = item
+    return index, run_point(point)
+
+
+def relaxation_max_t(lambd, mu, max_t, relaxations):
+    """Simulation length of a point in an adaptive sweep: `relaxations` times the relaxation time of an M/M/1 queue
+    with the same load, and at least max_t."""
+
+    return max(max_t, relaxations / (mu * (1 - lambd / mu) ** 2))
+
+
+def refinement_scores(by_lambda):
+    """Score the intervals between the consecutive lambdas of a curve; higher means a new point is more useful.
+
+    by_lambda maps each lambda to the W values of its replications. The score of an interval of width h is the
+    interpolation error estimate h^2 |f''| / 8 with f = log W (so that it doesn't only look at the largest Ws), plus
+    the relative half-width of the confidence interval of W at its endpoints. Return (score, low, high) triples."""
+
+    lambdas = sorted(by_lambda)
+    logs = [math.log(statistics.fmean(by_lambda[lambd])) for lambd in lambdas]
+    curvature = [0.0] * len(lambdas)  # second divided differences, at interior points only
+    for i in range(1, len(lambdas) - 1):
+        left = (logs[i] - logs[i - 1]) / (lambdas[i] - lambdas[i - 1])
+        right = (logs[i + 1] - logs[i]) / (lambdas[i + 1] - lambdas[i])
+        curvature[i] = abs(2 * (right - left) / (lambdas[i + 1] - lambdas[i - 1]))
+    if len(lambdas) > 2:  # at the ends, use the closest estimate available
+        curvature[0], curvature[-1] = curvature[1], curvature[-2]
+    uncertainty = []
+    for lambd in lambdas:
+        ws = by_lambda[lambd]
+        uncertainty.append(Z_95 * statistics.stdev(ws) / math.sqrt(len(ws)) / statistics.fmean(ws)
+                           if len(ws) > 1 else 0.0)
+
+    return [((high - low) ** 2 * max(curvature[i], curvature[i + 1]) / 8 + max(uncertainty[i], uncertainty[i + 1]),
+             low, high)
+            for i, (low, high) in enumerate(zip(lambdas, lambdas[1:]))]
+
+
+def run_points(pool, points, rows):
+    """Run points in the pool, printing each result and appending it to rows as soon as it's known; return the rows
+    of the points, in the same order."""
+
+    results = [None] * len(points)
+    for index, row in pool.imap_unordered(run_indexed_point, enumerate(points)):
+        print(', '.join(f'{column}={row[column]}' for column in CSV_COLUMNS))
+        rows.append(row)
+        results[index] = row
+    return results
+
+
+def adaptive_sweep(pool, args, rows):
+    """Run the rounds of an adaptive sweep (see the module docstring), appending results to rows."""
+
+    # a curve is a combination of all parameters but lambd; its runs are indexed by lambda
+    curves = {curve: {} for curve in itertools.product(*(getattr(args, column) for column in GRID_COLUMNS[1:]))}
+    new_lambdas = {curve: sorted(set(args.lambd)) for curve in curves}
+    for round_number in range(args.rounds + 1):
+        # point_curves[i] is the curve of points[i]: with common random numbers, points of different curves can
+        # have the same seed and, once max_t is scaled, the same parameters
+        points, point_curves = [], []
+        for curve_index, curve in enumerate(curves):
+            mu, max_t, *others = curve
+            for lambd in new_lambdas[curve]:
+                params = (lambd, mu, relaxation_max_t(lambd, mu, max_t, args.relaxations), *others)
+                for replication in range(args.replications):
+                    seed, crn = run_seed(args, replication, f'{curve_index}-{lambd}')
+                    points.append((seed, params, not args.no_cache, crn, args.engine))
+                    point_curves.append(curve)
+        for curve, row in zip(point_curves, run_points(pool, points, rows)):
+            curves[curve].setdefault(row['lambd'], []).append(row['w'])
+        if round_number < args.rounds:
+            for curve, by_lambda in curves.items():
+                best = sorted(refinement_scores(by_lambda), reverse=True)[:args.refine]
+                new_lambdas[curve] = [(low + high) / 2 for _, low, high in best]
+    print(f"simulated {sum(len(by_lambda) for by_lambda in curves.values())} points")
+
+
+def paired_differences(rows):
+    """Print, for each point, the difference between the W of each d and that of the smallest d.
+
+    Runs with the same seed (antithetic pairs averaged) are paired: with common random numbers, the confidence
+    interval of the mean difference is much narrower than the one of independent runs, also printed."""
+
+    w = {}  # (parameters but d, d) -> {seed: Ws}
+    for row in rows:
+        others = tuple(row[column] for column in GRID_COLUMNS if column != 'd')
+        w.setdefault((others, row['d']), {}).setdefault(row['seed'].removesuffix('-antithetic'), []).append(row['w'])
+    for (others, d), by_seed in sorted(w.items()):
+        reference = min(d2 for others2, d2 in w if others2 == others)
+        if d == reference:
+            continue
+        reference_by_seed = w[others, reference]
+        seeds = sorted(by_seed.keys() & reference_by_seed.keys())
+        if len(seeds) < 2:
+            continue
+        ws = [statistics.fmean(by_seed[seed]) for seed in seeds]
+        reference_ws = [statistics.fmean(reference_by_seed[seed]) for seed in seeds]
+        differences = [w1 - w2 for w1, w2 in zip(ws, reference_ws)]
+        half_width = Z_95 * statistics.stdev(differences) / math.sqrt(len(seeds))
+        independent = Z_95 * math.sqrt((statistics.variance(ws) + statistics.variance(reference_ws)) / len(seeds))
+        point = ', '.join(f'{column}={value}' for column, value in zip(
+            [column for column in GRID_COLUMNS if column != 'd'], others))
+        print(f"{point}: W(d={d}) - W(d={reference}) = {statistics.fmean(differences):.4f} ± {half_width:.4f} "
+              f"(independent runs: ± {independent:.4f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('db', help="results database (see results.py)")
+    parser.add_argument('--lambd', type=float, nargs='+', default=[0.5, 0.7, 0.9, 0.95, 0.99], help="arrival rates")
+    parser.add_argument('--mu', type=float, nargs='+', default=[1], help="service rates")
+    parser.add_argument('--max-t', type=float, nargs='+', default=[100_000], help="simulation lengths")
+    parser.add_argument('--n', type=int, nargs='+', default=[10], help="numbers of servers")
+    parser.add_argument('--d', type=int, nargs='+', default=[1, 2, 5, 10], help="numbers of queues to sample")
+    parser.add_argument('--shape', type=float, nargs='+', default=[1], help="Weibull shapes (1 is exponential)")
+    parser.add_argument('--discipline', choices=DISCIPLINES, nargs='+', default=['fifo'],
+                        help="scheduling disciplines")
+    parser.add_argument('--replications', type=int, default=1, help="runs with different seeds for each point")
+    parser.add_argument('--seed', default='0', help="base seed; each run gets a different seed derived from it")
+    parser.add_argument('--crn', choices=CRN_MODES,
+                        help="common random numbers across points, optionally with antithetic pairs of replications")
+    parser.add_argument('--engine', choices=ENGINES, default='events',
+                        help="simulation engine (see queue_sim.py); 'specialized' and 'vector' need --shape 1, "
+                             "--discipline fifo and no --crn")
+    parser.add_argument('--processes', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--no-cache', action='store_true', help="rerun points that were already simulated")
+    parser.add_argument('--rounds', type=int, default=0,
+                        help="refinement rounds of an adaptive sweep (0: just run the grid)")
+    parser.add_argument('--refine', type=int, default=2, help="new lambdas per curve in each adaptive round")
+    parser.add_argument('--relaxations', type=float, default=100,
+                        help="in adaptive sweeps, run each point for this many relaxation times (and at least max-t)")
+    args = parser.parse_args()
+
+    if args.engine != 'events' and (args.shape != [1] or args.discipline != ['fifo'] or args.crn is not None):
+        parser.error(f"the {args.engine} engine only supports --shape 1, --discipline fifo and independent runs")
+
+    rows = []
+    with multiprocessing.Pool(args.processes) as pool:
+        if args.rounds > 0:
+            if any(lambd >= mu for lambd in args.lambd for mu in args.mu):
+                parser.error("adaptive sweeps need stable systems: lambd < mu")
+            adaptive_sweep(pool, args, rows)
+        else:
+            grid = list(itertools.product(*(getattr(args, column) for column in GRID_COLUMNS)))
+            points = []
+            for i, params in enumerate(grid):
+                for replication in range(args.replications):
+                    seed, crn = run_seed(args, replication, i)
+                    points.append((seed, params, not args.no_cache, crn, args.engine))
+            run_points(pool, points, rows)
+    store = ResultStore(args.db)
+    store.add(rows)
+    store.close()
+    if args.crn is not None:
+        paired_differences(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+"""Vectorized engine for the supermarket model of `queue_sim.Queues`, with exponential times and FIFO servers.
+
+Rather than going through the event queue twice per job, jobs are generated in blocks with NumPy and each server only
+keeps the time when it becomes free: with FIFO, a job assigned to a server at time a leaves at
+max(a, free) + service time, so its departure is known when it arrives.
+
+  - With d = 1, queues are chosen independently of the state, and the departures of a whole block follow from the
+    Lindley recursion D_k = max(A_k, D_k-1) + S_k along the jobs of each server, which is solved without loops as
+    D_k = C_k + max(free, max_j<=k (A_j - C_j-1)), where C is the cumulative sum of the service times.
+  - With d > 1, a job needs the lengths of its sampled queues when it arrives: they are the number of departures
+    after that time, counted in a (servers, capacity) ring buffer of the departure times of the jobs each server got.
+    Jobs are decided in windows, all against the state at the start of the window; decisions are exact up to the
+    first job that sampled a queue chosen by an earlier job of the window, and the window is committed up to there.
+    Windows are sized so that this happens after about sqrt(n / d) jobs.
+
+Queue lengths are integrated over time as in `queue_sim.QueueLengthHistogram`, from the arrivals and departures of each
+block sorted by queue. Results have the same distribution as those of `queue_sim.Queues`, but not the same values with
+the same seed. The vector engine pays off with many servers (thousands and more) or with d = 1; with d > 1 and a few
+servers, windows hold a couple of jobs and the event engine is faster.
+
+Example:
+    queue_vector.py --lambd 0.9 --n 100_000 --d 2 --max-t 1000
+"""
+
+import argparse
+import math
+import random
+
+import numpy as np
+
+from queue_sim import tail_fractions
+
+BLOCK = 1 << 16  # jobs generated at once
+
+
+class VectorQueues:
+    """n FIFO servers with exponential service times at rate mu, receiving Poisson arrivals at rate lambd * n, each
+    joining the shortest of d queues sampled at random. Random values come from a NumPy generator seeded by rng (a
+    `random.Random` instance, by default the `random` module's shared generator)."""
+
+    def __init__(self, lambd, mu, n, d, rng=None):
+        self.lambd, self.mu, self.n, self.d = lambd, mu, n, d
+        self.np_rng = np.random.default_rng((rng if rng is not None else random).getrandbits(64))
+        self.t = 0.0  # time of the last generated arrival
+        self.free = np.zeros(n)  # time when each server is done with the jobs it has
+        self.departures = np.full((n, 8), -np.inf)  # ring buffers (d > 1): departure times of the jobs of each server
+        # only a window of at most this many jobs can be decided at once, see the module docstring
+        self.window = max(2, round(2 * math.sqrt(n / d)))
+        self.first_choice = np.full(n, self.window)  # scratch space for `decide`
+        self.response_time = 0.0  # sum over jobs completed so far
+        self.completed = 0
+        # time-weighted queue lengths: area[x] is the integral over time of the number of queues of length x, up to
+        # since[i] for queue i, whose length was then length[i]
+        self.area = np.zeros(1)
+        self.length = np.zeros(n, dtype=np.int64)
+        self.since = np.zeros(n)
+        self.pending = np.empty(0), np.empty(0, dtype=np.int64)  # departures not integrated yet: times, queues
+
+    def run(self, max_t):
+        """Simulate all arrivals up to max_t."""
+
+        last_block = False
+        while not last_block:
+            arrivals = self.t + np.cumsum(self.np_rng.exponential(1 / (self.lambd * self.n), BLOCK))
+            last_block = arrivals[-1] > max_t
+            arrivals = arrivals[arrivals <= max_t]
+            if len(arrivals) == 0:
+                break
+            self.t = arrivals[-1]
+            services = self.np_rng.exponential(1 / self.mu, len(arrivals))
+            if self.d == 1:
+                queues = self.np_rng.integers(0, self.n, len(arrivals))
+                departures = self.assign(arrivals, services, queues)
+            else:
+                queues, departures = self.decide(arrivals, services, self.sample(len(arrivals)))
+            completed = departures <= max_t
+            self.response_time += (departures[completed] - arrivals[completed]).sum()
+            self.completed += completed.sum()
+            self.integrate(self.t, arrivals, queues, departures)
+        self.t = max_t
+        self.integrate(max_t, np.empty(0), np.empty(0, dtype=np.int64), np.empty(0), everywhere=True)
+
+    def w(self):
+        """Average time spent in the system by completed jobs."""
+
+        return float(self.response_time / self.completed)
+
+    def fractions(self, max_length=None):
+        """Return a list whose x-th item is the fraction of queues with length >= x, averaged over the whole run, as
+        `queue_sim.QueueLengthHistogram.fractions`."""
+
+        return tail_fractions(self.area.tolist(), max_length)
+
+    def sample(self, jobs):
+        """The queues sampled by jobs arrivals, as a (jobs, d) array: every row is d distinct queues in random order.
+
+        The i-th column is drawn among n - i values, which are shifted past the queues already in the row."""
+
+        samples = np.empty((jobs, self.d), dtype=np.int64)
+        for i in range(self.d):
+            column = self.np_rng.integers(0, self.n - i, jobs)
+            for taken in np.sort(samples[:, :i], axis=1).T:  # in increasing order
+                column += column >= taken
+            samples[:, i] = column
+        return samples
+
+    def assign(self, arrivals, services, queues):
+        """Departure times of jobs joining the given queues, in order of arrival (Lindley recursion for each queue)."""
+
+        order = np.argsort(queues, kind='stable')  # jobs of each queue together, in order of arrival
+        a, s, q = arrivals[order], services[order], queues[order]
+        starts = np.flatnonzero(np.r_[True, q[1:] != q[:-1]])
+        segment = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(q)]))
+        c = np.cumsum(s)
+        c -= np.repeat(c[starts] - s[starts], np.diff(np.r_[starts, len(q)]))  # restart the sums at each queue
+        b = a - c + s  # A_j - C_j-1
+        # running maximum of b within each queue: ranks offset by queue stay in order across queues
+        ranks = np.empty(len(b), dtype=np.int64)
+        by_value = np.argsort(b)
+        ranks[by_value] = np.arange(len(b))
+        best = np.maximum.accumulate(segment * len(b) + ranks) - segment * len(b)
+        d = c + np.maximum(self.free[q], b[by_value[best]])
+        ends = np.r_[starts[1:], len(q)] - 1
+        self.free[q[ends]] = d[ends]
+        departures = np.empty_like(d)
+        departures[order] = d
+        return departures
+
+    def decide(self, arrivals, services, samples):
+        """Choose the queue of each job among its samples; return the queues and the departure times."""
+
+        jobs = len(arrivals)
+        queues = np.empty(jobs, dtype=np.int64)
+        departures = np.empty(jobs)
+        start = 0
+        while start < jobs:
+            end = min(start + self.window, jobs)
+            a, sampled = arrivals[start:end], samples[start:end]
+            lengths = (self.departures[sampled] > a[:, None, None]).sum(axis=2)
+            chosen = sampled[np.arange(end - start), lengths.argmin(axis=1)]  # the first shortest, as min() does
+            # decisions hold until a job sampled the queue of an earlier one
+            positions = np.arange(end - start)
+            self.first_choice[chosen[::-1]] = positions[::-1]
+            conflicts = (self.first_choice[sampled] < positions[:, None]).any(axis=1)
+            self.first_choice[chosen] = self.window
+            if conflicts.any():
+                end = start + conflicts.argmax()
+                a, chosen = a[:end - start], chosen[:end - start]
+            # chosen queues are all different: commit the jobs at once
+            d = np.maximum(a, self.free[chosen]) + services[start:end]
+            self.free[chosen] = d
+            slots = self.departures[chosen] <= a[:, None]  # those of jobs that already left
+            while not slots.any(axis=1).all():  # some server has more jobs than its buffer can hold
+                self.departures = np.hstack([self.departures, np.full_like(self.departures, -np.inf)])
+                slots = self.departures[chosen] <= a[:, None]
+            self.departures[chosen, slots.argmax(axis=1)] = d
+            queues[start:end], departures[start:end] = chosen, d
+            start = end
+        return queues, departures
+
+    def integrate(self, t, arrivals, queues, departures, everywhere=False):
+        """Add the queue lengths up to t to the areas, given the arrivals and departures since the last call (up to t
+        for arrivals); later departures are kept for the next calls. With everywhere, all queues are brought to t."""
+
+        pending_times, pending_queues = self.pending
+        times = np.r_[pending_times, departures]
+        departing = np.r_[pending_queues, queues]
+        later = times > t
+        self.pending = times[later], departing[later]
+        touched = np.arange(self.n) if everywhere else np.unique(np.r_[queues, departing[~later]])
+        # events: the start of the current interval of each queue, then arrivals (+1) and departures (-1)
+        times = np.r_[self.since[touched], arrivals, times[~later]]
+        event_queues = np.r_[touched, queues, departing[~later]]
+        deltas = np.r_[np.zeros(len(touched), dtype=np.int64), np.ones(len(arrivals), dtype=np.int64),
+                       np.full((~later).sum(), -1)]
+        order = np.lexsort((times, event_queues))
+        times, event_queues, deltas = times[order], event_queues[order], deltas[order]
+        starts = np.flatnonzero(np.r_[True, event_queues[1:] != event_queues[:-1]])
+        sizes = np.diff(np.r_[starts, len(times)])
+        lengths = np.cumsum(deltas)
+        lengths += np.repeat(self.length[event_queues[starts]] - lengths[starts] + deltas[starts], sizes)
+        ends = np.r_[starts[1:], len(times)] - 1
+        next_times = np.r_[times[1:], t]
+        next_times[ends] = t
+        area = np.bincount(lengths, weights=next_times - times)
+        if len(area) > len(self.area):
+            self.area = np.r_[self.area, np.zeros(len(area) - len(self.area))]
+        self.area[:len(area)] += area
+        self.length[event_queues[ends]] = lengths[ends]
+        self.since[touched] = t
+
+
+def simulate(lambd, mu, max_t, n, d, rng=None):
+    """Run one simulation and return W, the average time spent in the system by completed jobs."""
+
+    sim = VectorQueues(lambd, mu, n, d, rng)
+    sim.run(max_t)
+    return sim.w()
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--lambd', type=float, default=0.7, help="arrival rate")
+    parser.add_argument('--mu', type=float, default=1, help="service rate")
+    parser.add_argument('--max-t', type=float, default=1_000_000, help="maximum time to run the simulation")
+    parser.add_argument('--n', type=int, default=1, help="number of servers")
+    parser.add_argument('--d', type=int, default=1, help="number of queues to sample")
+    parser.add_argument('--max-length', type=int, default=15, help="longest queue length to report")
+    parser.add_argument('--seed', help="random seed")
+    args = parser.parse_args()
+    if not 1 <= args.d <= args.n:
+        parser.error("d must be between 1 and n")
+
+    sim = VectorQueues(args.lambd, args.mu, args.n, args.d, random.Random(args.seed))
+    sim.run(args.max_t)
+    print(f"Average time spent in the system: {sim.w()}")
+    print("Fraction of queues with length >= x:")
+    for x, fraction in enumerate(sim.fractions(args.max_length)):
+        print(f"  {x}: {fraction:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""Run independent replications of a simulation as threads of a single process.
+
+Every replication gets its own `random.Random`, seeded from a master seed, and passes it to the model it builds
+(`queue_sim.Queues`, `storage.Backup` and `sir.SIR` all take an `rng` argument), so threads never share random state
+and a seeded set of replications gives the same results whatever the number of threads. Inputs such as a
+`contact_network.ContactNetwork` or a configuration read once are shared by all threads as they are, without being
+pickled for worker processes. On free-threaded CPython builds the threads run in parallel; with the GIL they take
+turns, and `multiprocessing` (as in queue_sweep.py or sir_ensemble.py) remains the faster option.
+
+Example:
+    replications.py queue --lambd 0.9 --d 2 --replications 32 --threads 8 --seed 1
+    replications.py sir --network graph.npz --replications 100 --threads 8
+"""
+
+import argparse
+import math
+import random
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from scheduling import DISCIPLINES
+
+Z_95 = 1.96  # for 95% confidence intervals
+
+
+def replication_seeds(replications, seed=None):
+    """Seeds for the replications, drawn from a generator seeded with seed (at random if None)."""
+
+    master = random.Random(seed)
+    return [master.getrandbits(64) for _ in range(replications)]
+
+
+def run_replications(function, seeds, threads=None):
+    """Return [function(random.Random(seed)) for seed in seeds], computed by a pool of threads.
+
+    function must only modify objects it creates: anything else it uses is shared by all threads."""
+
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(lambda seed: function(random.Random(seed)), seeds))
+
+
+def mean_and_half_width(values):
+    """Mean of values and half width of its 95% confidence interval (normal approximation)."""
+
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, math.inf
+    return mean, Z_95 * statistics.stdev(values) / math.sqrt(len(values))
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('model', choices=['queue', 'sir'])
+    parser.add_argument('--replications', type=int, default=16)
+    parser.add_argument('--threads', type=int, help="worker threads (default: chosen by ThreadPoolExecutor)")
+    parser.add_argument('--seed', help="master seed, from which the seeds of the replications are drawn")
+    queue_args = parser.add_argument_group("queue options (see queue_sim.py)")
+    queue_args.add_argument('--lambd', type=float, default=0.7)
+    queue_args.add_argument('--mu', type=float, default=1)
+    queue_args.add_argument('--max-t', type=float, default=1_000_000)
+    queue_args.add_argument('--n', type=int, default=1)
+    queue_args.add_argument('--d', type=int, default=1)
+    queue_args.add_argument('--shape', type=float, default=1)
+    queue_args.add_argument('--discipline', choices=DISCIPLINES, default='fifo')
+    sir_args = parser.add_argument_group("SIR options (see sir.py)")
+    sir_args.add_argument('--population', type=int, default=1000)
+    sir_args.add_argument('--infected', type=int, default=1)
+    sir_args.add_argument('--avg-contact-time', type=float, default=1)
+    sir_args.add_argument('--avg-recovery-time', type=float, default=3)
+    sir_args.add_argument('--engine', default='agent')
+    sir_args.add_argument('--network', help="contact graph, loaded once and shared by all replications")
+    args = parser.parse_args()
+
+    seeds = replication_seeds(args.replications, args.seed)
+    if args.model == 'queue':
+        from queue_sim import simulate
+
+        def replication(rng):
+            return simulate(args.lambd, args.mu, args.max_t, args.n, args.d, args.shape, args.discipline, rng=rng)
+
+        w, half_width = mean_and_half_width(run_replications(replication, seeds, args.threads))
+        print(f"W = {w:.4f} ± {half_width:.4f} over {args.replications} replications")
+        return
+
+    from sir import simulate
+
+    network = None
+    if args.network is not None:
+        from contact_network import ContactNetwork  # needs NumPy
+
+        network = ContactNetwork.load(args.network)
+        args.population = network.n
+
+    def replication(rng):
+        s, i, r = simulate(args.engine, args.population, args.infected, 1 / args.avg_contact_time,
+                           1 / args.avg_recovery_time, network=network, rng=rng)
+        return max(i), r[-1]
+
+    peaks, finals = zip(*run_replications(replication, seeds, args.threads))
+    for name, values in ("peak infected", peaks), ("final recovered", finals):
+        mean, half_width = mean_and_half_width(values)
+        print(f"{name}: {mean:.1f} ± {half_width:.1f} over {args.replications} replications")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""SQLite store for the results of queue simulations.
+
+Each run is a row with its parameters, the seed, the engine that produced it, the git revision of the code and the
+measured W. Parameter columns are indexed, so that plotting scripts can select the points they need without reading
+everything; rows are written in bulk, in a single transaction, by the sweep runners.
+"""
+
+import csv
+import sqlite3
+import subprocess
+import time
+from functools import cache
+from pathlib import Path
+
+COLUMNS = ['lambd', 'mu', 'max_t', 'n', 'd', 'shape', 'discipline', 'seed', 'engine', 'revision', 'w', 'created']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    lambd REAL NOT NULL,
+    mu REAL NOT NULL,
+    max_t REAL NOT NULL,
+    n INTEGER NOT NULL,
+    d INTEGER NOT NULL,
+    shape REAL NOT NULL DEFAULT 1,
+    discipline TEXT NOT NULL DEFAULT 'fifo',
+    seed TEXT,  -- NULL if the run was not seeded
+    engine TEXT NOT NULL,
+    revision TEXT NOT NULL,
+    w REAL NOT NULL,
+    created REAL NOT NULL  -- UNIX timestamp
+);
+CREATE INDEX IF NOT EXISTS runs_params ON runs (mu, max_t, n, d, shape, discipline, lambd);
+"""
+
+
+@cache
+def git_revision():
+    """Return the git commit of the simulator code, with a '-dirty' suffix if there are uncommitted changes."""
+
+    directory = Path(__file__).parent
+    try:
+        revision = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=directory, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=directory,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return revision + ('-dirty' if dirty else '')
+
+
+class ResultStore:
+    """A SQLite database of simulation runs."""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def add(self, rows):
+        """Insert many runs at once; each row is a dict with the keys in `COLUMNS` (revision and created are
+        filled in if missing)."""
+
+        now = time.time()
+        values = [[row.get(column) for column in COLUMNS[:-3]]
+                  + [row.get('revision') or git_revision(), row['w'], row.get('created', now)]
+                  for row in rows]
+        with self.connection:  # one transaction for all rows
+            self.connection.executemany(f"INSERT INTO runs ({', '.join(COLUMNS)}) "
+                                        f"VALUES ({', '.join('?' * len(COLUMNS))})", values)
+
+    def query(self, **filters):
+        """Return the runs whose parameters are among the given values, e.g. query(d=[1, 2], n=[10]), as dicts.
+
+        Filters on the indexed parameters are answered through the index.
+        """
+
+        conditions, values = [], []
+        for column, accepted in filters.items():
+            if column not in COLUMNS:
+                raise ValueError(f"unknown column {column}")
+            accepted = list(accepted)
+            conditions.append(f"{column} IN ({', '.join('?' * len(accepted))})")
+            values.extend(accepted)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        cursor = self.connection.execute(f"SELECT {', '.join(COLUMNS)} FROM runs{where}", values)
+        return [dict(zip(COLUMNS, row)) for row in cursor]
+
+    def import_csv(self, filename, engine='events', legacy_layout='fifo'):
+        """Add the rows of a CSV file written by `queue_sim.main`, in any of its past layouts (7-column rows are read
+        according to legacy_layout, see `plot_queue_w.parse_rows`)."""
+
+        from plot_queue_w import parse_rows
+
+        with open(filename, newline='') as f:
+            self.add([{**row._asdict(), 'engine': engine, 'revision': 'unknown'}
+                      for row in parse_rows(csv.reader(f), legacy_layout)])
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == '__main__':  # import existing CSV results
+    import argparse
+
+    from plot_queue_w import LEGACY_LAYOUTS
+
+    parser = argparse.ArgumentParser(description="Import CSV files written by queue_sim.py into a results database")
+    parser.add_argument('db')
+    parser.add_argument('csv', nargs='+')
+    parser.add_argument('--legacy-layout', choices=LEGACY_LAYOUTS, default='fifo',
+                        help="script that wrote 7-column rows: weibull.py (fifo) or weibull_preemptive_lifo2.py (lifo)")
+    args = parser.parse_args()
+
+    store = ResultStore(args.db)
+    for filename in args.csv:
+        store.import_csv(filename, legacy_layout=args.legacy_layout)
+    store.close()
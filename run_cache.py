@@ -0,0 +1,117 @@
+"""Disk cache for the results of simulation runs.
+
+A run is identified by its model name, its parameters (seed included) and a hash of the source code of the modules
+that implement it, so editing the simulator automatically invalidates old results. Results (summary statistics and,
+optionally, time series) are stored as JSON files named after the hash of all of this. When the cache grows beyond
+its size limit, the least recently used entries are deleted: reading an entry updates its modification time. Each
+process keeps an estimate of the size of the cache, from its last scan of the directory plus what it wrote since, and
+only scans the directory again when the estimate goes over the limit.
+
+Only seeded runs should be cached, as the result of an unseeded run is not a function of its parameters.
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+from functools import cache
+
+CACHE_DIR = os.environ.get('SIM_CACHE_DIR', '.sim_cache')
+MAX_BYTES = 256 * 1024 ** 2  # default size limit
+EVICT_TO = 0.9  # fraction of the size limit that eviction brings the cache down to
+
+# directory -> estimated size of its entries, in this process (see RunCache.evict)
+estimated_sizes = {}
+
+
+@cache
+def code_version(*modules):
+    """Hash of the source code of the given modules (by name)."""
+
+    digest = hashlib.sha256()
+    for name in sorted(modules):
+        with open(importlib.util.find_spec(name).origin, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class RunCache:
+    """A directory of cached results, with LRU eviction above max_bytes."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, model, params, modules):
+        """The content address of a run: a hash of the model name, parameters and code version."""
+
+        description = json.dumps({'model': model, 'params': params, 'code': code_version(*modules)}, sort_keys=True)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        """Return the cached result for key, or None."""
+
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:  # evicted by another process in the meantime
+            pass
+        return result
+
+    def put(self, key, result):
+        """Store a JSON-serializable result, then evict old entries if the cache is too big."""
+
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.path(key) + f'.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(result, f)
+            size = f.tell()
+        os.replace(tmp, self.path(key))  # atomic, so that concurrent readers never see partial files
+        if self.directory not in estimated_sizes:
+            self.evict()  # scans the directory, computing the estimate
+        else:
+            estimated_sizes[self.directory] += size
+            if estimated_sizes[self.directory] > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """If the cache is bigger than max_bytes, delete the least recently used entries until it fits in
+        EVICT_TO * max_bytes, so that `put` only scans again once the rest of the limit has been written; update the
+        size estimate."""
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                try:
+                    entries.append((entry.stat(), entry.path))
+                except FileNotFoundError:  # removed by another process
+                    pass
+        total = sum(stat.st_size for stat, _ in entries)
+        target = self.max_bytes * EVICT_TO if total > self.max_bytes else self.max_bytes
+        for stat, path in sorted(entries, key=lambda item: item[0].st_mtime):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # removed by another process
+                pass
+            total -= stat.st_size
+        estimated_sizes[self.directory] = total
+
+    def run(self, model, params, modules, function):
+        """Return function()'s result for this model and params, computing and storing it only if not cached."""
+
+        key = self.key(model, params, modules)
+        result = self.get(key)
+        if result is None:
+            result = function()
+            self.put(key, result)
+        return result
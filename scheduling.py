@@ -0,0 +1,212 @@
+"""Scheduling disciplines for the servers of a queueing simulation.
+
+Each server object holds the jobs assigned to it and decides which one runs. Jobs keep track of how much work they
+still need, so a preempted job resumes from where it stopped. A server has at most one pending `JobCompletion` event;
+when the running job changes, the old event is canceled (like `storage.TransferComplete`) and skipped once popped.
+
+The simulation using a server must provide a `job_completed(server, job)` method, which is called after the server
+has finished a job and started the next one; to record `JobCompletion` events in a `discrete_event_sim.EventTrace`, it
+must also provide `server_payload(server)`.
+"""
+
+import collections
+import heapq
+from dataclasses import dataclass
+from typing import Optional
+
+from discrete_event_sim import Simulation, Event
+
+
+@dataclass(eq=False)
+class Job:
+    """A job with its service requirement."""
+
+    id: int
+    size: float  # total amount of work needed (i.e., service time when running alone)
+    remaining: float  # work still needed; for the running job, this is the value when it was (re)started
+
+
+class JobCompletion(Event):
+    """The running job of a server completes, unless the event has been canceled in the meantime."""
+
+    def __init__(self, server: 'Server'):
+        self.server = server
+        self.canceled = False
+
+    def process(self, sim: Simulation):
+        if self.canceled:
+            return  # the job this event was scheduled for has been preempted
+        server = self.server
+        job = server.finish(sim)
+        sim.job_completed(server, job)
+
+    def trace_payload(self, sim: Simulation):
+        return sim.server_payload(self.server)
+
+
+class Server:
+    """A server and its queue. Subclass this and implement `__len__`, `arrive` and `next_job`."""
+
+    def __init__(self):
+        self.running: Optional[Job] = None  # job currently served
+        self.started = 0.0  # when the running job was (re)started
+        self.completion: Optional[JobCompletion] = None  # pending completion event of the running job
+        self.index: Optional[int] = None  # position among the servers of the simulation, if it sets it
+
+    def __len__(self):
+        """Number of jobs at this server, including the running one."""
+        raise NotImplementedError
+
+    def arrive(self, sim: Simulation, job: Job):
+        """A new job is assigned to this server."""
+        raise NotImplementedError
+
+    def next_job(self) -> Optional[Job]:
+        """Remove and return the job to run after a completion, or None if the queue is empty."""
+        raise NotImplementedError
+
+    def start(self, sim: Simulation, job: Job):
+        """Run job and schedule its completion."""
+
+        self.running = job
+        self.started = sim.t
+        self.completion = JobCompletion(self)
+        sim.schedule(job.remaining, self.completion)
+
+    def preempt(self, sim: Simulation) -> Job:
+        """Stop the running job, cancel its completion and return it with its remaining work updated."""
+
+        job = self.running
+        job.remaining = max(0.0, job.remaining - (sim.t - self.started))
+        self.completion.canceled = True
+        self.running = self.completion = None
+        return job
+
+    def finish(self, sim: Simulation) -> Job:
+        """Called when the running job completes: start the next job, if any, and return the finished one."""
+
+        job = self.running
+        job.remaining = 0.0
+        self.running = self.completion = None
+        next_job = self.next_job()
+        if next_job is not None:
+            self.start(sim, next_job)
+        return job
+
+
+class FIFO(Server):
+    """First in, first out, without preemption."""
+
+    def __init__(self):
+        super().__init__()
+        self.queue = collections.deque()
+
+    def __len__(self):
+        return (self.running is not None) + len(self.queue)
+
+    def arrive(self, sim, job):
+        if self.running is None:
+            self.start(sim, job)
+        else:
+            self.queue.append(job)
+
+    def next_job(self):
+        return self.queue.popleft() if self.queue else None
+
+
+class LIFOPreemptive(Server):
+    """Last in, first out, preemptive-resume: a new job interrupts the running one, which resumes later."""
+
+    def __init__(self):
+        super().__init__()
+        self.stack = []  # interrupted or waiting jobs, the last one is resumed first
+
+    def __len__(self):
+        return (self.running is not None) + len(self.stack)
+
+    def arrive(self, sim, job):
+        if self.running is not None:
+            self.stack.append(self.preempt(sim))
+        self.start(sim, job)
+
+    def next_job(self):
+        return self.stack.pop() if self.stack else None
+
+
+class ProcessorSharing(Server):
+    """Processor sharing: the k jobs at the server all progress at the same time, each at 1/k of the speed.
+
+    Rather than updating every job's remaining work at each event, we keep a virtual time that advances at speed 1/k:
+    a job arriving at virtual time v with size x completes when the virtual time reaches v + x. Jobs are kept in a
+    heap ordered by that value, so that arrivals and completions are O(log k) and only the completion of the first
+    job in the heap is scheduled.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.jobs = []  # heap of (virtual finish time, job id, job)
+        self.virtual_time = 0.0
+        self.updated = 0.0  # simulated time at which virtual_time was last computed
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def advance(self, t):
+        """Bring the virtual time up to time t."""
+
+        if self.jobs:
+            self.virtual_time += (t - self.updated) / len(self.jobs)
+        self.updated = t
+
+    def reschedule(self, sim):
+        """Replace the pending completion with the one of the job that will finish first now."""
+
+        if self.completion is not None:
+            self.completion.canceled = True
+            self.completion = None
+        if self.jobs:
+            self.completion = JobCompletion(self)
+            sim.schedule(max(0.0, self.jobs[0][0] - self.virtual_time) * len(self.jobs), self.completion)
+
+    def arrive(self, sim, job):
+        self.advance(sim.t)
+        heapq.heappush(self.jobs, (self.virtual_time + job.remaining, job.id, job))
+        self.reschedule(sim)
+
+    def finish(self, sim):
+        self.advance(sim.t)
+        _, _, job = heapq.heappop(self.jobs)
+        job.remaining = 0.0
+        self.completion = None  # this is the event being processed
+        self.reschedule(sim)
+        return job
+
+
+class SRPT(Server):
+    """Shortest remaining processing time first, preemptive: a new job shorter than what's left of the running one
+    interrupts it. Waiting jobs are kept in a heap ordered by remaining work, so each event is O(log n)."""
+
+    def __init__(self):
+        super().__init__()
+        self.waiting = []  # heap of (remaining work, job id, job)
+
+    def __len__(self):
+        return (self.running is not None) + len(self.waiting)
+
+    def arrive(self, sim, job):
+        running = self.running
+        if running is None:
+            self.start(sim, job)
+        elif job.remaining < running.remaining - (sim.t - self.started):
+            preempted = self.preempt(sim)
+            heapq.heappush(self.waiting, (preempted.remaining, preempted.id, preempted))
+            self.start(sim, job)
+        else:
+            heapq.heappush(self.waiting, (job.remaining, job.id, job))
+
+    def next_job(self):
+        return heapq.heappop(self.waiting)[2] if self.waiting else None
+
+
+# name -> server class, for command-line options
+DISCIPLINES = {'fifo': FIFO, 'lifo-pr': LIFOPreemptive, 'ps': ProcessorSharing, 'srpt': SRPT}
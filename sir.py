@@ -1,58 +1,86 @@
 #!/usr/bin/env python3
 
 import argparse
-import collections
 import enum
 import logging
+import os
 import random
 
-from matplotlib import pyplot as plt
-
 from discrete_event_sim import Simulation, Event
 
+# modules whose code determines the results, used to invalidate cached runs (see run_cache.py)
+MODULES = ['sir', 'sir_aggregate', 'contact_network', 'discrete_event_sim']
+
 
-class Condition(enum.Enum):
-    """The condition of simulated individuals."""
+class Condition(enum.IntEnum):
+    """The condition of simulated individuals (stored as byte values in `SIR.conditions`)."""
 
     SUSCEPTIBLE = 0
     INFECTED = 1
     RECOVERED = 2
 
 
+# plain ints for the per-event checks, compared with the ints read from the bytearray
+SUSCEPTIBLE, INFECTED, RECOVERED = int(Condition.SUSCEPTIBLE), int(Condition.INFECTED), int(Condition.RECOVERED)
+
+
 class SIR(Simulation):
     """The state of the simulation.
 
     We have the simulation parameters contact_rate and recovery_rate, plus the condition of every individual, as a
-    list: conditions[i] represent the condition of the i-th individuals.
+    bytearray: conditions[i] represent the condition of the i-th individuals.
+
+    susceptible, infected and recovered are the current number of individuals in each condition, kept up to date by
+    `infect` and `Recover`. s, i and r monitor those numbers over time -- this is sampled periodically by the
+    `sample` method, registered with `Simulation.add_sampler`.
 
-    s, i and r monitor the number of susceptible, infected and recovered individuals over time -- this is sampled
-    periodically through the MonitorSIR event.
+    If network is a `ContactNetwork`, contacts only happen between neighbours in that graph (whose nodes must be the
+    individuals of the population); otherwise the population is fully mixed.
     """
 
-    def __init__(self, population, infected, contact_rate, recovery_rate, plot_interval):
+    def __init__(self, population, infected, contact_rate, recovery_rate, plot_interval, network=None, rng=None):
         super().__init__()  # call the initialization method from Simulation
+        self.rng = rng if rng is not None else random  # a random.Random, so that threads don't share generators
         self.contact_rate = contact_rate
         self.recovery_rate = recovery_rate
-        self.conditions = [Condition.SUSCEPTIBLE] * population  # a list of identical items of length 'population'
-        for i in random.sample(range(population), infected):  # starting infected individuals
+        assert network is None or network.n == population, "the contact network must cover the whole population"
+        self.network = network
+        self.conditions = bytearray(population)  # one byte per individual, all SUSCEPTIBLE
+        self.susceptible, self.infected, self.recovered = population, 0, 0
+        for i in self.rng.sample(range(population), infected):  # starting infected individuals
             self.infect(i)
         self.s, self.i, self.r = [], [], []  # values of susceptible, infected, recovered over time
-        self.schedule(0, MonitorSIR(plot_interval))
+        self.add_sampler(plot_interval, SIR.sample, start=0)
+
+    def sample(self):
+        """Every plot_interval, we save the number of susceptible, infected and recovered individuals."""
+
+        self.s.append(self.susceptible)
+        self.i.append(self.infected)
+        self.r.append(self.recovered)
+        return self.infected > 0  # if nobody is infected anymore, the simulation is over
 
     def schedule_contact(self, patient):
         """Schedule a patient's next contact."""
 
-        other = random.randrange(len(self.conditions))  # choose a random contact
-        self.schedule(random.expovariate(self.contact_rate), Contact(patient, other))
+        if self.network is None:
+            other = self.rng.randrange(len(self.conditions))  # choose a random contact
+        else:
+            other = self.network.random_neighbour(patient, self.rng)
+            if other is None:
+                return  # isolated individuals can't infect anybody
+        self.schedule(self.rng.expovariate(self.contact_rate), Contact(patient, other))
 
     def infect(self, i):
         """Patient i is infected."""
 
-        self.log_info(f"{i} infected")
-        self.conditions[i] = Condition.INFECTED
+        self.log_info("%d infected", i)
+        self.conditions[i] = INFECTED
+        self.susceptible -= 1
+        self.infected += 1
         self.schedule_contact(i)  # schedule the patient's next contact
         # (further contacts will be scheduled by the Contact event, see the process() function)
-        self.schedule(random.expovariate(self.recovery_rate), Recover(i))  # schedule the patient's recovery
+        self.schedule(self.rng.expovariate(self.recovery_rate), Recover(i))  # schedule the patient's recovery
 
 
 class Contact(Event):
@@ -67,10 +95,10 @@ class Contact(Event):
     def process(self, sim):
         """If the patient is still infectious and the contact is susceptible, the latter will be infected."""
 
-        sim.log_info(f"{self.source} contacts {self.destination}")
-        if sim.conditions[self.source] != Condition.INFECTED:
+        sim.log_info("%d contacts %d", self.source, self.destination)
+        if sim.conditions[self.source] != INFECTED:
             return  # healthy people can't infect
-        if sim.conditions[self.destination] == Condition.SUSCEPTIBLE:
+        if sim.conditions[self.destination] == SUSCEPTIBLE:
             sim.infect(self.destination)
         sim.schedule_contact(self.source)  # schedule the next contact
 
@@ -82,24 +110,45 @@ class Recover(Event):
         self.patient = patient
 
     def process(self, sim):
-        sim.log_info(f"{self.patient} recovered")
-        sim.conditions[self.patient] = Condition.RECOVERED
+        sim.log_info("%d recovered", self.patient)
+        sim.conditions[self.patient] = RECOVERED
+        sim.infected -= 1
+        sim.recovered += 1
 
 
-class MonitorSIR(Event):
-    """At any configurable interval, we save the number of susceptible, infected and recovered individuals."""
+ENGINES = ['agent', 'gillespie', 'tau-leaping']
 
-    def __init__(self, interval=1):
-        self.interval = interval
 
-    def process(self, sim):
-        ctr = collections.Counter(sim.conditions) # recovered,infected,recovered {infected: 1, recovered: 2}
-        infected = ctr[Condition.INFECTED]
-        sim.s.append(ctr[Condition.SUSCEPTIBLE])
-        sim.i.append(infected)
-        sim.r.append(ctr[Condition.RECOVERED])
-        if infected > 0:  # if nobody is infected anymore, the simulation is over.
-            sim.schedule(self.interval, self)
+def simulate(engine, population, infected, contact_rate, recovery_rate, plot_interval=1, tau=None, network=None,
+             rng=None):
+    """Run one epidemic with the chosen engine and return the s, i and r series sampled every plot_interval.
+
+    Only the agent-based engine supports contact networks. Random values come from rng (a `random.Random`) if given,
+    otherwise from the global generators.
+    """
+
+    if network is not None and engine != 'agent':
+        raise ValueError(f"the {engine} engine assumes a fully mixed population")
+    if engine == 'agent':
+        sim = SIR(population, infected, contact_rate, recovery_rate, plot_interval, network, rng)
+        sim.run()
+        assert INFECTED not in sim.conditions  # nobody should be infected at the end of the sim
+        return sim.s, sim.i, sim.r
+    # the other engines and their dependencies (NumPy for tau-leaping) are imported when needed, so that agent-based
+    # runs start quickly
+    if engine == 'gillespie':
+        from sir_aggregate import gillespie
+
+        return gillespie(population, infected, contact_rate, recovery_rate, plot_interval, rng or random)
+    if engine == 'tau-leaping':
+        import numpy as np
+
+        from sir_aggregate import tau_leaping
+
+        np_rng = np.random.default_rng(rng.getrandbits(64)) if rng is not None else None
+        s, i, r = tau_leaping(population, infected, contact_rate, recovery_rate, plot_interval, tau, rng=np_rng)
+        return s[0], i[0], r[0]
+    raise ValueError(f"unknown engine {engine}")
 
 
 def main():
@@ -111,23 +160,52 @@ def main():
     parser.add_argument("--avg-recovery-time", type=float, default=3)
     parser.add_argument("--verbose", action='store_true')
     parser.add_argument("--plot_interval", type=float, default=1, help="how often to collect data points for the plot")
+    parser.add_argument("--engine", choices=ENGINES, default='agent',
+                        help="simulate every individual, or only the S/I/R counts (exactly or with tau-leaping)")
+    parser.add_argument("--tau", type=float, help="time step for tau-leaping (default: plot_interval / 10)")
+    parser.add_argument("--network", help="contact graph (edge list or .npz from contact_network.py); "
+                                          "its number of nodes replaces --population")
+    parser.add_argument("--no-cache", action='store_true', help="don't reuse results of identical seeded runs")
     args = parser.parse_args()
 
+    network = None
+    if args.network is not None:
+        if args.engine != 'agent':
+            parser.error("--network requires the agent engine")
+        from contact_network import ContactNetwork  # needs NumPy
+
+        network = ContactNetwork.load(args.network)
+        args.population = network.n
+
     if args.seed:
         random.seed(args.seed)  # set a seed to make experiments repeatable
     if args.verbose:
         logging.basicConfig(format='{levelname}:{message}', level=logging.INFO, style='{')  # output info on stdout
 
-    # the rates to use in random.expovariate are 1 over the desired mean
-    sim = SIR(args.population, args.infected, 1 / args.avg_contact_time, 1 / args.avg_recovery_time, args.plot_interval)
-    sim.run()
-    assert all(c != Condition.INFECTED for c in sim.conditions)  # nobody should be infected at the end of the sim
-    print(f"Simulation over at time {sim.t:.2f}")
-
-    days = [i * args.plot_interval for i in range(len(sim.s))]  # compute the times at which values were taken
-    plt.plot(days, sim.s, label="Susceptible")
-    plt.plot(days, sim.i, label="Infected")
-    plt.plot(days, sim.r, label="Recovered")
+    def run():
+        # the rates to use in random.expovariate are 1 over the desired mean
+        series = simulate(args.engine, args.population, args.infected, 1 / args.avg_contact_time,
+                          1 / args.avg_recovery_time, args.plot_interval, args.tau, network)
+        return [list(map(int, values)) for values in series]
+
+    if args.seed and not args.no_cache:
+        params = {name: value for name, value in vars(args).items() if name not in ('verbose', 'no_cache')}
+        if network is not None:  # identify the graph file by its size and modification time, not only its name
+            stat = os.stat(args.network)
+            params['network'] = [args.network, stat.st_size, stat.st_mtime]
+        from run_cache import RunCache
+
+        s, i, r = RunCache().run('sir', params, MODULES, run)
+    else:
+        s, i, r = run()
+    print(f"Epidemic over at time {(len(s) - 1) * args.plot_interval:.2f}")
+
+    from matplotlib import pyplot as plt  # only needed here, so that other modules can use SIR without matplotlib
+
+    days = [k * args.plot_interval for k in range(len(s))]  # compute the times at which values were taken
+    plt.plot(days, s, label="Susceptible")
+    plt.plot(days, i, label="Infected")
+    plt.plot(days, r, label="Recovered")
     plt.xlabel("Days")
     plt.ylabel("Individuals")
     plt.legend(loc=0)
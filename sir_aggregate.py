@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""Aggregate engines for the SIR model of `sir.py`.
+
+Rather than following every individual, these engines only track how many people are susceptible, infected and
+recovered. In the agent-based model each infected individual contacts a random member of the population (themselves
+included) at rate contact_rate and recovers at rate recovery_rate, hence with s susceptible and i infected people in a
+population of n:
+
+    infections happen at rate contact_rate * i * s / n
+    recoveries happen at rate recovery_rate * i
+
+Both engines return the s, i and r series sampled every `plot_interval`, like `sir.SIR.sample` does: the last sample
+is the first one where nobody is infected anymore.
+"""
+
+import math
+import random
+
+
+def gillespie(population, infected, contact_rate, recovery_rate, plot_interval=1, rng=random):
+    """Exact stochastic simulation (Gillespie's direct method) of the SIR model; returns the s, i and r lists.
+
+    Random values come from rng, a `random.Random` instance."""
+
+    s, i, r = population - infected, infected, 0
+    ss, ii, rr = [], [], []
+    t = 0
+    while True:
+        infection_rate = contact_rate * i * s / population
+        total_rate = infection_rate + recovery_rate * i
+        t = t + rng.expovariate(total_rate) if total_rate > 0 else math.inf  # time of the next event
+        while len(ss) * plot_interval < t:  # the state doesn't change before the next event: sample it
+            ss.append(s)
+            ii.append(i)
+            rr.append(r)
+            if i == 0:
+                return ss, ii, rr
+        if rng.random() * total_rate < infection_rate:
+            s -= 1
+            i += 1
+        else:
+            i -= 1
+            r += 1
+
+
+def tau_leaping(population, infected, contact_rate, recovery_rate, plot_interval=1, tau=None, replicas=1, rng=None):
+    """Approximate simulation of the SIR model that advances time in fixed steps of length (about) tau.
+
+    Within a step, each susceptible individual is infected with probability 1 - exp(-contact_rate * i / n * tau) and
+    each infected one recovers with probability 1 - exp(-recovery_rate * tau), so counts never become negative. tau is
+    rounded so that an integer number of steps fits in `plot_interval`; it defaults to a tenth of it.
+
+    All `replicas` are simulated at once: the result is a triple of (replicas, samples) int64 arrays, and replicas
+    where the epidemic ended early simply keep their final values until the last one is over.
+    """
+
+    import numpy as np  # only needed here, so that the Gillespie engine doesn't need NumPy
+
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))  # follow the seed given to the random module
+    steps = max(1, round(plot_interval / tau)) if tau is not None else 10
+    tau = plot_interval / steps
+    recovery_p = -math.expm1(-recovery_rate * tau)
+
+    s = np.full(replicas, population - infected, dtype=np.int64)
+    i = np.full(replicas, infected, dtype=np.int64)
+    r = np.zeros(replicas, dtype=np.int64)
+    ss, ii, rr = [s.copy()], [i.copy()], [r.copy()]
+    while i.any():
+        for _ in range(steps):
+            infection_p = -np.expm1(-contact_rate * tau / population * i)
+            new_infected = rng.binomial(s, infection_p)
+            new_recovered = rng.binomial(i, recovery_p)
+            s -= new_infected
+            i += new_infected - new_recovered
+            r += new_recovered
+        ss.append(s.copy())
+        ii.append(i.copy())
+        rr.append(r.copy())
+    return np.stack(ss, axis=1), np.stack(ii, axis=1), np.stack(rr, axis=1)
+
+
+if __name__ == '__main__':  # statistical cross-check against the agent-based engine
+    import numpy as np
+
+    from sir import SIR
+
+    population, infected, contact_rate, recovery_rate = 2000, 10, 1, 1 / 3
+    n_runs = 200
+
+    def agent():
+        sim = SIR(population, infected, contact_rate, recovery_rate, 1)
+        sim.run()
+        return sim.s, sim.i, sim.r
+
+    engines = {
+        'agent': agent,
+        'gillespie': lambda: gillespie(population, infected, contact_rate, recovery_rate),
+        'tau-leaping': lambda: [x[0] for x in tau_leaping(population, infected, contact_rate, recovery_rate)],
+    }
+    for name, engine in engines.items():
+        random.seed(42)
+        results = [engine() for _ in range(n_runs)]
+        final_recovered = [r[-1] for _, _, r in results]
+        peak_infected = [max(i) for _, i, _ in results]
+        for label, values in ('final recovered', final_recovered), ('peak infected', peak_infected):
+            mean, std = np.mean(values), np.std(values, ddof=1)
+            print(f"{name:>11}: {label} {mean:8.1f} ± {1.96 * std / math.sqrt(n_runs):5.1f} (95% CI)")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+"""Run many SIR epidemics with different seeds and summarize them.
+
+Trajectories are aligned on the monitoring grid (epidemics that end early keep their final values), then we compute
+mean and quantile bands for s, i and r plus statistics on the infection peak. Results are written as a compressed
+NumPy archive (.npz) or as a CSV file, depending on the extension of the output file; matplotlib is never imported.
+"""
+
+import argparse
+import csv
+import multiprocessing
+import random
+
+import numpy as np
+
+from sir import ENGINES, simulate
+from sir_aggregate import tau_leaping
+
+
+def run_replica(params):
+    """Run one epidemic; params is a (seed, engine, population, infected, contact_rate, recovery_rate,
+    plot_interval, tau) tuple so that this can be passed to `multiprocessing.Pool.map`."""
+
+    seed, *sim_params = params
+    return simulate(*sim_params, rng=random.Random(seed))
+
+
+def align(trajectories):
+    """Turn a list of (s, i, r) series of different lengths into three (replicas, samples) arrays."""
+
+    length = max(len(s) for s, _, _ in trajectories)
+    result = np.empty((3, len(trajectories), length), dtype=np.int64)
+    for replica, series in enumerate(trajectories):
+        for k, values in enumerate(series):
+            result[k, replica, :len(values)] = values
+            result[k, replica, len(values):] = values[-1]  # after the end of the epidemic nothing changes
+    return result
+
+
+def run_ensemble(replicas, engine, population, infected, contact_rate, recovery_rate, plot_interval=1, tau=None,
+                 seed=None, processes=None):
+    """Run `replicas` epidemics and return their aligned s, i and r as a (3, replicas, samples) array.
+
+    Tau-leaping replicas are vectorized in a single call; the other engines run in a pool of `processes` workers.
+    """
+
+    rng = random.Random(seed)
+    if engine == 'tau-leaping':
+        numpy_rng = np.random.default_rng(rng.getrandbits(64))
+        return np.stack(tau_leaping(population, infected, contact_rate, recovery_rate, plot_interval, tau, replicas,
+                                    numpy_rng))
+    params = [(rng.getrandbits(64), engine, population, infected, contact_rate, recovery_rate, plot_interval, tau)
+              for _ in range(replicas)]
+    chunksize = max(1, replicas // (4 * (processes or multiprocessing.cpu_count())))
+    with multiprocessing.Pool(processes) as pool:
+        return align(pool.map(run_replica, params, chunksize))
+
+
+def summarize(trajectories, quantiles):
+    """Compute the statistics we save from a (3, replicas, samples) array of aligned trajectories."""
+
+    infected = trajectories[1]
+    peaks = infected.max(axis=1)
+    return {
+        'mean': trajectories.mean(axis=1),  # (3, samples)
+        'quantiles': np.quantile(trajectories, quantiles, axis=1),  # (len(quantiles), 3, samples)
+        'peak_infected': peaks,  # per replica
+        'peak_sample': infected.argmax(axis=1),  # index of the sample in which the peak happened, per replica
+        'final_recovered': trajectories[2, :, -1],
+    }
+
+
+def write_csv(filename, days, quantiles, summary):
+    """Write one row per sample, with mean and quantiles for each of s, i and r."""
+
+    header = ['day']
+    for name in 'sir':
+        header.append(f'{name}_mean')
+        header.extend(f'{name}_q{q:g}' for q in quantiles)
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for k, day in enumerate(days):
+            row = [day]
+            for condition in range(3):
+                row.append(summary['mean'][condition, k])
+                row.extend(summary['quantiles'][:, condition, k])
+            writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("output", help="where to save the results (.npz for NumPy, anything else for CSV)")
+    parser.add_argument("--replicas", type=int, default=100, help="number of epidemics to simulate")
+    parser.add_argument("--processes", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--population", type=int, default=1000)
+    parser.add_argument("--infected", type=int, default=1, help="starting infected individuals")
+    parser.add_argument("--seed", help="random seed")
+    parser.add_argument("--avg-contact-time", type=float, default=1)
+    parser.add_argument("--avg-recovery-time", type=float, default=3)
+    parser.add_argument("--plot_interval", type=float, default=1, help="how often to collect data points")
+    parser.add_argument("--engine", choices=ENGINES, default='gillespie')
+    parser.add_argument("--tau", type=float, help="time step for tau-leaping (default: plot_interval / 10)")
+    parser.add_argument("--quantiles", type=float, nargs='*', default=[0.05, 0.5, 0.95])
+    args = parser.parse_args()
+
+    trajectories = run_ensemble(args.replicas, args.engine, args.population, args.infected, 1 / args.avg_contact_time,
+                                1 / args.avg_recovery_time, args.plot_interval, args.tau, args.seed, args.processes)
+    summary = summarize(trajectories, args.quantiles)
+    days = np.arange(trajectories.shape[2]) * args.plot_interval
+
+    if args.output.endswith('.npz'):
+        np.savez_compressed(args.output, days=days, quantile_levels=args.quantiles, **summary)
+    else:
+        write_csv(args.output, days, args.quantiles, summary)
+
+    peaks, peak_days = summary['peak_infected'], days[summary['peak_sample']]
+    print(f"Peak infected: mean {peaks.mean():.1f}, "
+          + ", ".join(f"q{q:g} {v:.1f}" for q, v in zip(args.quantiles, np.quantile(peaks, args.quantiles))))
+    print(f"Peak day: mean {peak_days.mean():.1f}; "
+          f"final recovered: mean {summary['final_recovered'].mean():.1f}")
+
+
+if __name__ == '__main__':
+    main()
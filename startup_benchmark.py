@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+"""Measure how long the simulation scripts take to start, and what batching runs saves.
+
+For each module, `python -X importtime -c "import module"` runs in a fresh interpreter: the total import time is the
+sum of the cumulative times of the top-level imports (the interpreter's own, such as site, included), and the heaviest
+imports of the module itself are listed. With --runs, the same short run of a script is then timed as that many
+separate processes, and as many lines fed to a single batch_worker.py process.
+
+Example:
+    startup_benchmark.py queue_sim storage sir --runs 50 --script queue_sim --args "--max-t 10 --n 10 --d 2"
+"""
+
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_times(module):
+    """Import module in a new interpreter; return its total import time and the [(time, name)] cumulative times of the
+    module's direct imports, heaviest first. Times are in microseconds."""
+
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=HERE,
+                            capture_output=True, text=True, check=True)
+    entries = []  # (depth, cumulative time, name), in the order of the report: imports come before their importer
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # names are indented by two spaces per level
+        entries.append((depth, int(cumulative), name.strip()))
+    total = sum(cumulative for depth, cumulative, _ in entries if depth == 0)
+    children = []
+    position = max(i for i, (depth, _, name) in enumerate(entries) if depth == 0 and name == module)
+    for depth, cumulative, name in reversed(entries[:position]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children.append((cumulative, name))
+    return total, sorted(children, reverse=True)
+
+
+def timed(command, stdin=None):
+    """Wall-clock seconds taken by a command, whose output is discarded."""
+
+    start = time.perf_counter()
+    subprocess.run(command, cwd=HERE, input=stdin, stdout=subprocess.DEVNULL, text=True, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('modules', nargs='*', default=['queue_sim', 'queue_sweep', 'storage', 'storage_region', 'sir'])
+    parser.add_argument('--top', type=int, default=5, help="heaviest direct imports to list for each module")
+    parser.add_argument('--runs', type=int, default=0, help="runs for the separate processes / batch comparison")
+    parser.add_argument('--script', default='queue_sim', help="script of the comparison (see batch_worker.SCRIPTS)")
+    parser.add_argument('--args', default='--max-t 10 --n 10 --d 2', help="options of each run of the comparison")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        total, children = import_times(module)
+        heaviest = ', '.join(f'{name} {microseconds / 1000:.1f}' for microseconds, name in children[:args.top])
+        print(f"{module}: {total / 1000:.1f} ms of imports (heaviest, ms: {heaviest})")
+
+    if args.runs:
+        argv = shlex.split(args.args)
+        separate = sum(timed([sys.executable, f'{args.script}.py', *argv]) for _ in range(args.runs))
+        batch = timed([sys.executable, 'batch_worker.py', args.script], stdin=(args.args + '\n') * args.runs)
+        print(f"{args.runs} runs of {args.script}.py {args.args}: {separate:.2f} s as separate processes, "
+              f"{batch:.2f} s in one batch_worker.py (x{separate / batch:.1f})")
+
+
+if __name__ == '__main__':
+    main()
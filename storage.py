@@ -5,21 +5,21 @@ import configparser
 import logging
 import random
 from dataclasses import dataclass
-from random import expovariate
 from typing import Optional, List
 
 # the humanfriendly library (https://humanfriendly.readthedocs.io/en/latest/) lets us pass parameters in human-readable
 # format (e.g., "500 KiB" or "5 days"). You can safely remove this if you don't want to install it on your system, but
 # then you'll need to handle sizes in bytes and time spans in seconds--or write your own alternative.
 # It should be trivial to install (e.g., apt install python3-humanfriendly or conda/pip install humanfriendly).
-from humanfriendly import format_timespan, parse_size, parse_timespan
+# It is imported where it's used, so that importing this module stays fast and runs that don't read a configuration
+# file or log anything don't need it.
 
-from discrete_event_sim import Simulation, Event
+from discrete_event_sim import Simulation, Event, EventTrace
 
 
-def exp_rv(mean):
-    """Return an exponential random variable with the given mean."""
-    return expovariate(1 / mean)
+def exp_rv(mean, rng=random):
+    """Return an exponential random variable with the given mean, drawn from rng."""
+    return rng.expovariate(1 / mean)
 
 
 class DataLost(Exception):
@@ -33,14 +33,17 @@ class Backup(Simulation):
 
     # type annotations for `Node` are strings here to allow a forward declaration:
     # https://stackoverflow.com/questions/36193540/self-reference-or-forward-reference-of-type-annotations-in-python
-    def __init__(self, nodes: List['Node']):
+    def __init__(self, nodes: List['Node'], rng=None):
         super().__init__()  # call the __init__ method of parent class
+        # random.Random instance used for all random values; by default, the random module's shared one
+        self.rng = rng if rng is not None else random
         self.nodes = nodes
+        self.node_ids = {node: i for i, node in enumerate(nodes)}  # used in event traces
 
         # we add to the event queue the first event of each node going online and of failing
         for node in nodes:
             self.schedule(node.arrival_time, Online(node))
-            self.schedule(node.arrival_time + exp_rv(node.average_lifetime), Fail(node))
+            self.schedule(node.arrival_time + exp_rv(node.average_lifetime, self.rng), Fail(node))
 
     def schedule_transfer(self, uploader: 'Node', downloader: 'Node', block_id: int, restore: bool):
         """Helper function called by `Node.schedule_next_upload` and `Node.schedule_next_download`.
@@ -66,11 +69,11 @@ class Backup(Simulation):
         # self.log_info(f"scheduled {event.__class__.__name__} from {uploader} to {downloader}"
         #               f" in {format_timespan(delay)}")
 
-    def log_info(self, msg):
+    def format_time(self):
         """Override method to get human-friendly logging for time."""
-        logging.info(f'{format_timespan(self.t)}: {msg}')
+        from humanfriendly import format_timespan
 
-        # print(f'{format_timespan(self.t)}: {msg}')
+        return format_timespan(self.t)
 
 
 @dataclass(eq=False)  # auto initialization from parameters below (won't consider two nodes with same state as equal)
@@ -223,6 +226,9 @@ class NodeEvent(Event):
         """Must be implemented by subclasses."""
         raise NotImplementedError
 
+    def trace_payload(self, sim):
+        return sim.node_ids[self.node], -1, 0.0
+
 
 class Online(NodeEvent):
     """A node goes online."""
@@ -236,7 +242,7 @@ class Online(NodeEvent):
         node.schedule_next_upload(sim)
         node.schedule_next_download(sim)
         # schedule the next offline event
-        sim.schedule(exp_rv(node.average_uptime), Offline(node))
+        sim.schedule(exp_rv(node.average_uptime, sim.rng), Offline(node))
 
 
 
@@ -245,10 +251,10 @@ class Recover(Online):
 
     def process(self, sim: Backup):
         node = self.node
-        sim.log_info(f"{node} recovers")
+        sim.log_info("%s recovers", node)
         node.failed = False
         super().process(sim)
-        sim.schedule(exp_rv(node.average_lifetime), Fail(node))
+        sim.schedule(exp_rv(node.average_lifetime, sim.rng), Fail(node))
 
 
 class Disconnection(NodeEvent):
@@ -284,14 +290,14 @@ class Offline(Disconnection):
         assert node.online
         self.disconnect()
         # schedule the next online event
-        sim.schedule(exp_rv(self.node.average_downtime), Online(node))
+        sim.schedule(exp_rv(self.node.average_downtime, sim.rng), Online(node))
 
 
 class Fail(Disconnection):
     """A node fails and loses all local data."""
 
     def process(self, sim: Backup):
-        sim.log_info(f"{self.node} fails")
+        sim.log_info("%s fails", self.node)
         self.disconnect()
         node = self.node
         node.failed = True
@@ -304,7 +310,7 @@ class Fail(Disconnection):
         node.remote_blocks_held.clear()
         node.free_space = node.storage_size - node.block_size * node.n
         # schedule the next online and recover events
-        recover_time = exp_rv(node.average_recover_time)
+        recover_time = exp_rv(node.average_recover_time, sim.rng)
         sim.schedule(recover_time, Recover(node))
 
 
@@ -321,7 +327,7 @@ class TransferComplete(Event):
         assert self.uploader is not self.downloader
 
     def process(self, sim: Backup):
-        sim.log_info(f"{self.__class__.__name__} from {self.uploader} to {self.downloader}")
+        sim.log_info("%s from %s to %s", self.__class__.__name__, self.uploader, self.downloader)
         if self.canceled:
             return  # this transfer was canceled, so ignore this event
         uploader, downloader = self.uploader, self.downloader
@@ -330,18 +336,32 @@ class TransferComplete(Event):
         uploader.current_upload = downloader.current_download = None
         uploader.schedule_next_upload(sim)
         downloader.schedule_next_download(sim)
+        if not sim.log_enabled():
+            return  # don't count blocks for nothing
         for node in [uploader, downloader]:
-            sim.log_info(f"{node}: {sum(node.local_blocks)} local blocks, "
-                         f"{sum(peer is not None for peer in node.backed_up_blocks)} backed up blocks, "
-                         f"{len(node.remote_blocks_held)} remote blocks held")
+            sim.log_info("%s: %d local blocks, %d backed up blocks, %d remote blocks held",
+                         node, sum(node.local_blocks), sum(peer is not None for peer in node.backed_up_blocks),
+                         len(node.remote_blocks_held))
 
     def update_block_state(self):
         """Needs to be specified by the subclasses, `BackupComplete` and `DownloadComplete`."""
         raise NotImplementedError
 
+    def owner(self) -> Node:
+        """The node whose block is transferred."""
+        raise NotImplementedError
+
+    def trace_payload(self, sim):
+        """Uploader and downloader ids, and the bytes transferred (0 if the transfer was canceled)."""
+        return (sim.node_ids[self.uploader], sim.node_ids[self.downloader],
+                0.0 if self.canceled else float(self.owner().block_size))
+
 
 class BlockBackupComplete(TransferComplete):
 
+    def owner(self):
+        return self.uploader
+
     def update_block_state(self):
         owner, peer = self.uploader, self.downloader
         peer.free_space -= owner.block_size
@@ -351,25 +371,20 @@ class BlockBackupComplete(TransferComplete):
 
 
 class BlockRestoreComplete(TransferComplete):
+    def owner(self):
+        return self.downloader
+
     def update_block_state(self):
         owner = self.downloader
         owner.local_blocks[self.block_id] = True
         if sum(owner.local_blocks) == owner.k:  # we have exactly k local blocks, we have all of them then
-            logging.info(f"{owner} has fully recovered its data.")
+            logging.info("%s has fully recovered its data.", owner)
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("config", help="configuration file")
-    parser.add_argument("--max-t", default="100 years")
-    parser.add_argument("--seed", help="random seed")
-    parser.add_argument("--verbose", action='store_true')
-    args = parser.parse_args()
+def read_nodes(filename):
+    """Build the list of nodes described by a configuration file."""
 
-    if args.seed:
-        random.seed(args.seed)  # set a seed to make experiments repeatable
-    if args.verbose:
-        logging.basicConfig(format='{levelname}:{message}', level=logging.INFO, style='{')  # output info on stdout
+    from humanfriendly import parse_size, parse_timespan
 
     # functions to parse every parameter of peer configuration
     parsing_functions = [
@@ -382,7 +397,7 @@ def main():
     ]
 
     config = configparser.ConfigParser()
-    config.read(args.config)
+    config.read(filename)
     nodes = []  # we build the list of nodes to pass to the Backup class
     for node_class in config.sections():
         class_config = config[node_class]
@@ -390,9 +405,34 @@ def main():
         cfg = [parse(class_config[name]) for name, parse in parsing_functions]
         # the `callable(p1, p2, *args)` idiom is equivalent to `callable(p1, p2, args[0], args[1], ...)
         nodes.extend(Node(f"{node_class}-{i}", *cfg) for i in range(class_config.getint('number')))
-    sim = Backup(nodes)
-    sim.run(parse_timespan(args.max_t))
-    sim.log_info(f"Simulation over")
+    return nodes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", help="configuration file")
+    parser.add_argument("--max-t", default="100 years")
+    parser.add_argument("--seed", help="random seed")
+    parser.add_argument("--verbose", action='store_true')
+    parser.add_argument("--trace", help="write a binary trace of all events to this file (see trace_analysis.py)")
+    parser.add_argument("--max-events", type=int, help="stop after this many events")
+    parser.add_argument("--wall-time", type=float, help="stop after this many seconds of real time")
+    args = parser.parse_args(argv)
+
+    if args.seed:
+        random.seed(args.seed)  # set a seed to make experiments repeatable
+    if args.verbose:
+        logging.basicConfig(format='{levelname}:{message}', level=logging.INFO, style='{')  # output info on stdout
+
+    from humanfriendly import parse_timespan
+
+    sim = Backup(read_nodes(args.config))
+    if args.trace:
+        sim.trace = EventTrace(args.trace)
+    reason = sim.run(parse_timespan(args.max_t), args.max_events, args.wall_time)
+    if args.trace:
+        sim.trace.close()
+    sim.log_info("Simulation over (%s)", reason)
 
 
 if __name__ == '__main__':
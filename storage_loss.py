@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+"""Estimate the probability that `storage.Backup` loses data before a time horizon.
+
+Data loss is a rare event, so most brute-force runs never see it. We use fixed-effort multilevel splitting instead.
+The redundancy of a node is the number of its blocks that still exist somewhere (locally or on a peer) minus k;
+data is lost when it becomes negative for some node. Each stage runs `effort` simulations until the minimum
+redundancy drops to the next level (or the horizon is reached); the next stage restarts from copies of the states that
+made it, chosen at random. The product of the fractions of successful runs at each stage is an unbiased estimator of
+the loss probability, and each stage only needs to observe a moderately rare event.
+
+A copy of a simulation state has the same pending events, so its future would be identical to the original's: when
+copying, the pending events whose delays are exponential (nodes going online or offline, failing and recovering) are
+drawn again. Since exponential delays are memoryless, this doesn't change the distribution of the process.
+
+Example:
+    storage_loss.py p2p.cfg --max-t "10 years" --effort 200
+"""
+
+import argparse
+import copy
+import heapq
+import logging
+import math
+import random
+
+from storage import Backup, Fail, Offline, Online, Recover, TransferComplete, exp_rv, read_nodes
+
+Z_95 = 1.96  # for 95% confidence intervals
+
+
+def redundancy(sim: Backup):
+    """Minimum, over the nodes that have data, of the number of their blocks that exist somewhere minus k."""
+
+    return min(sum(held_locally or peer is not None for held_locally, peer
+                   in zip(node.local_blocks, node.backed_up_blocks)) - node.k
+               for node in sim.nodes if node.k > 0)
+
+
+def run_until(sim: Backup, level, max_t):
+    """Run sim until the redundancy is at most level, and return True, or until max_t, and return False."""
+
+    if redundancy(sim) <= level:
+        return True
+    while sim.events:
+        t, event = heapq.heappop(sim.events)
+        if t > max_t:
+            return False
+        sim.t = t
+        event.process(sim)
+        # blocks are only lost by failures and only come back through transfers
+        if isinstance(event, (Fail, TransferComplete)) and redundancy(sim) <= level:
+            return True
+    return False
+
+
+def clock_mean(sim: Backup, event):
+    """Mean of the exponential delay with which event was scheduled, or None if its delay isn't memoryless."""
+
+    node = getattr(event, 'node', None)
+    if node is None or sim.t < node.arrival_time:  # transfers, and events of nodes that didn't arrive yet
+        return None
+    if isinstance(event, Recover):  # check this before Online, as Recover is a subclass
+        return node.average_recover_time
+    if isinstance(event, Online):
+        return node.average_downtime
+    if isinstance(event, Offline):
+        return node.average_uptime
+    if isinstance(event, Fail):
+        return node.average_lifetime
+    return None
+
+
+def resampled_copy(sim: Backup):
+    """Copy sim, drawing new delays for its pending memoryless events."""
+
+    sim = copy.deepcopy(sim, {id(sim.rng): sim.rng})  # copies share the generator: a copied one would replay its values
+    events = []
+    for t, event in sim.events:
+        mean = clock_mean(sim, event)
+        events.append((t if mean is None else sim.t + exp_rv(mean, sim.rng), event))
+    heapq.heapify(events)
+    sim.events = events
+    return sim
+
+
+def splitting(config, max_t, effort):
+    """Estimate the loss probability before max_t; return the list of the conditional probabilities of reaching each
+    level from the previous one (their product is the estimate)."""
+
+    nodes = read_nodes(config)
+    levels = range(min(node.n - node.k for node in nodes if node.k > 0) - 1, -2, -1)  # the last one, -1, is loss
+    starts = [None]  # states from which the current stage starts; None stands for a new simulation
+    probabilities = []
+    for level in levels:
+        hits = []
+        for _ in range(effort):
+            start = random.choice(starts)
+            sim = Backup(read_nodes(config)) if start is None else resampled_copy(start)
+            if run_until(sim, level, max_t):
+                hits.append(sim)
+        probabilities.append(len(hits) / effort)
+        logging.info(f"redundancy {level} reached in {len(hits)} runs out of {effort}")
+        if not hits:
+            break
+        starts = hits
+    probabilities.extend([0.0] * (len(levels) - len(probabilities)))
+    return probabilities
+
+
+def brute_force(config, max_t, runs):
+    """Estimate the loss probability before max_t as the fraction of independent runs that lose data."""
+
+    return sum(run_until(Backup(read_nodes(config)), -1, max_t) for _ in range(runs)) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("config", help="configuration file")
+    parser.add_argument("--max-t", default="100 years", help="time horizon")
+    parser.add_argument("--effort", type=int, default=100, help="simulations per splitting stage")
+    parser.add_argument("--brute-force", type=int, metavar='RUNS',
+                        help="instead of splitting, run this many independent simulations (for comparison)")
+    parser.add_argument("--seed", help="random seed")
+    parser.add_argument("--verbose", action='store_true')
+    args = parser.parse_args()
+
+    if args.seed:
+        random.seed(args.seed)  # set a seed to make experiments repeatable
+    # storage logs every event at the INFO level; only show it (and our progress) on request
+    logging.basicConfig(format='{levelname}:{message}', level=logging.INFO if args.verbose else logging.WARNING,
+                        style='{')
+    from humanfriendly import parse_timespan
+
+    max_t = parse_timespan(args.max_t)
+
+    if args.brute_force:
+        p = brute_force(args.config, max_t, args.brute_force)
+        half_width = Z_95 * math.sqrt(p * (1 - p) / args.brute_force)
+        print(f"P(data loss within {args.max_t}) ~= {p:.3g} ± {half_width:.2g}")
+        return
+
+    probabilities = splitting(args.config, max_t, args.effort)
+    for level, p in zip(range(len(probabilities) - 2, -2, -1), probabilities):
+        print(f"P(redundancy {level} | redundancy {level + 1}) ~= {p:.3g}")
+    p = math.prod(probabilities)
+    if p == 0:
+        print(f"no run reached data loss within {args.max_t}: increase --effort")
+        return
+    # relative variance of the product, treating the stages as independent binomial samples (an approximation)
+    log_sd = math.sqrt(sum((1 - p_stage) / (args.effort * p_stage) for p_stage in probabilities))
+    print(f"P(data loss within {args.max_t}) ~= {p:.3g} "
+          f"(approximate 95% interval {p * math.exp(-Z_95 * log_sd):.2g}-{p * math.exp(Z_95 * log_sd):.2g})")
+
+
+if __name__ == '__main__':
+    main()
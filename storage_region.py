@@ -4,14 +4,14 @@ import argparse
 import configparser
 import logging
 import random
-from dataclasses import dataclass, field
-from discrete_event_sim import Simulation, Event
-from typing import Optional, List
-from humanfriendly import format_timespan, parse_size, parse_timespan
+from dataclasses import dataclass
+from discrete_event_sim import EventTrace
+from typing import List
 
-from edit_storage import NodeEvent, Node, Backup, exp_rv, Online, Fail
+from edit_storage import NodeEvent, Node, Backup, exp_rv, Online, Fail, Link, PLACEMENTS
 
-logging.basicConfig(filename="storage.log", format='{levelname}:{message}', level=logging.INFO, style='{')
+# modules whose code determines the results, used to invalidate cached runs (see run_cache.py)
+MODULES = ['storage_region', 'edit_storage', 'discrete_event_sim', 'parallel_regions']
 
 @dataclass
 class Region:
@@ -27,16 +27,20 @@ class Region:
 class JoinNetwork(NodeEvent):
     """A new node joins the network."""
     def process(self, sim: Backup):
+        from humanfriendly import format_timespan
+
         node = self.node
         if node not in sim.nodes:
             sim.nodes.append(node)
             print(f"{format_timespan(sim.t)}: {node} joined the network")
-            sim.schedule(exp_rv(node.average_uptime), Online(node))
-            sim.schedule(exp_rv(node.average_lifetime), Fail(node))
+            sim.schedule(exp_rv(node.average_uptime, sim.rng), Online(node))
+            sim.schedule(exp_rv(node.average_lifetime, sim.rng), Fail(node))
 
 class LeaveNetwork(NodeEvent):
     """A node leaves the network."""
     def process(self, sim: Backup):
+        from humanfriendly import format_timespan
+
         node = self.node
         if node in sim.nodes:
             sim.nodes.remove(node)
@@ -44,34 +48,37 @@ class LeaveNetwork(NodeEvent):
             sim.schedule(node.join_interval, JoinNetwork(node))
 
 
-# Extend the main simulation logic to schedule join and leave events
-def schedule_dynamic_behaviors(sim: Backup, regions: List[Region]):
-    """Schedule join and leave events for nodes in different regions."""
-    for region in regions:
-        for node in region.nodes:
-            join_time = exp_rv(region.join_interval)
-            leave_time = exp_rv(region.leave_interval)
-            sim.schedule(join_time, JoinNetwork(node))
-            sim.schedule(leave_time, LeaveNetwork(node))
+def parse_links(section) -> dict[tuple[str, str], Link]:
+    """Parse the `[links]` config section into the inter-region matrix used by `Backup`.
 
-# Example of extending main() to include dynamic behaviors
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("config", help="configuration file")
-    parser.add_argument("--max-t", default="10 years")
-    parser.add_argument("--seed", help="random seed")
-    parser.add_argument("--verbose", action='store_true')
-    args = parser.parse_args()
+    Each entry looks like `USA Germany = 120 ms, 5 MiB` (latency, then bandwidth per second). A link is symmetric
+    unless the reverse direction has its own entry.
+    """
+
+    from humanfriendly import parse_size, parse_timespan
+
+    links = {}
+    explicit = set()
+    for key, value in section.items():
+        source, destination = key.split()
+        latency, bandwidth = (item.strip() for item in value.split(','))
+        link = Link(parse_timespan(latency), parse_size(bandwidth))
+        links[source, destination] = link
+        explicit.add((source, destination))
+        if (destination, source) not in explicit:
+            links[destination, source] = link
+    return links
 
-    if args.seed:
-        random.seed(args.seed)  # Set a seed to make experiments repeatable
-    if args.verbose:
-        logging.basicConfig(format='{levelname}:{message}', level=logging.INFO, style='{')
 
-    # Parse node configurations
+def build_regions(config_text):
+    """Parse a configuration; return its regions, with their nodes, and the links between them."""
+
+    from humanfriendly import parse_size, parse_timespan
+
     config = configparser.ConfigParser()
-    config.read(args.config)
-    nodes = []
+    config.optionxform = str  # keep the case of keys, as region names in [links] are case-sensitive
+    config.read_string(config_text)
+    links = parse_links(config['links']) if config.has_section('links') else {}
     parsing_functions = [
         ('n', int), ('k', int),
         ('data_size', parse_size), ('storage_size', parse_size),
@@ -79,12 +86,13 @@ def main():
         ('average_uptime', parse_timespan), ('average_downtime', parse_timespan),
         ('average_lifetime', parse_timespan), ('average_recover_time', parse_timespan),
         ('arrival_time', parse_timespan), ('join_interval', parse_timespan), ('leave_interval', parse_timespan)
-    
     ]
     c = 0
     regions = []
 
     for node_class in config.sections():
+        if node_class == 'links':
+            continue
         class_config = config[node_class]
         cfg = [parse(class_config[name]) for name, parse in parsing_functions]
         active_hours = list(range(*map(int, class_config.get('active_hours', '0-23').split('-'))))
@@ -96,22 +104,91 @@ def main():
         region_nodes = [Node(f"{node_class}-{i}", *cfg) for i in range(n)]
 
         region=Region(region_name, region_nodes, join_interval, leave_interval,active_hours)
-        for nodes in region_nodes:
-            nodes.region = region
+        for node in region_nodes:
+            node.region = region
         regions.append(region)
+    return regions, links
 
-    # Initialize simulation and schedule dynamic behaviors
-    max_t = parse_timespan(args.max_t)
-    sim = Backup(nodes, max_t,regions)
-    # schedule_dynamic_behaviors(sim, regions)
-    sim.run(max_t)
-    sim.log_info("Simulation over")
 
+# Extend the main simulation logic to schedule join and leave events
+def schedule_dynamic_behaviors(sim: Backup, regions: List[Region]):
+    """Schedule join and leave events for nodes in different regions."""
     for region in regions:
-        reg_avg_hours=sum(sim.region_avg_hours[region.name])/len(sim.region_avg_hours[region.name])
-        print(f"Average recovery time in hours for {region.name}: {reg_avg_hours}")
+        for node in region.nodes:
+            join_time = exp_rv(region.join_interval, sim.rng)
+            leave_time = exp_rv(region.leave_interval, sim.rng)
+            sim.schedule(join_time, JoinNetwork(node))
+            sim.schedule(leave_time, LeaveNetwork(node))
+
+# Example of extending main() to include dynamic behaviors
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", help="configuration file")
+    parser.add_argument("--max-t", default="10 years")
+    parser.add_argument("--seed", help="random seed")
+    parser.add_argument("--verbose", action='store_true')
+    parser.add_argument("--log", help="write the log (as with --verbose) to this file, e.g. storage.log")
+    parser.add_argument("--trace", help="write a binary trace of all events to this file (see trace_analysis.py)")
+    parser.add_argument("--no-cache", action='store_true', help="don't reuse results of identical seeded runs")
+    parser.add_argument("--placement", choices=PLACEMENTS, default='local',
+                        help="where blocks can be backed up: only in the node's region, or in the cheapest linked ones")
+    parser.add_argument("--parallel", action='store_true',
+                        help="simulate each region in its own process; regions are only independent with the "
+                             "local placement (see parallel_regions.py)")
+    args = parser.parse_args(argv)
+    if args.parallel and args.trace:
+        parser.error("--trace isn't supported with --parallel")
+    if args.parallel and args.placement != 'local':
+        parser.error("--parallel needs the local placement: with nearest, regions exchange blocks")
+
+    if args.seed:
+        random.seed(args.seed)  # Set a seed to make experiments repeatable
+    if args.verbose or args.log:
+        logging.basicConfig(filename=args.log, format='{levelname}:{message}', level=logging.INFO, style='{')
+
+    with open(args.config) as f:
+        config_text = f.read()
+
+    def run():
+        """Parse the configuration, simulate, and return the average recovery hours of each region."""
+
+        from humanfriendly import parse_timespan
+
+        regions, links = build_regions(config_text)
+        max_t = parse_timespan(args.max_t)
+
+        if args.parallel:
+            import parallel_regions
+
+            region_avg_hours = parallel_regions.simulate(config_text, max_t, args.seed)
+        else:
+            # Initialize simulation and schedule dynamic behaviors
+            nodes = [node for region in regions for node in region.nodes]
+            sim = Backup(nodes, max_t,regions, links, args.placement)
+            if args.trace:
+                sim.trace = EventTrace(args.trace)
+            # schedule_dynamic_behaviors(sim, regions)
+            sim.run(max_t)
+            if args.trace:
+                sim.trace.close()
+            sim.log_info("Simulation over")
+            region_avg_hours = sim.region_avg_hours
+
+        return {region.name: sum(region_avg_hours[region.name]) / len(region_avg_hours[region.name])
+                for region in regions}
+
+    if args.seed and not (args.no_cache or args.log or args.trace):  # logs and traces need an actual run
+        # the whole configuration is part of the key, not just the file name
+        params = dict(config=config_text, max_t=args.max_t, placement=args.placement, seed=args.seed,
+                      parallel=args.parallel)
+        from run_cache import RunCache
+
+        averages = RunCache().run('storage_region', params, MODULES, run)
+    else:
+        averages = run()
+    for region_name, reg_avg_hours in averages.items():
+        print(f"Average recovery time in hours for {region_name}: {reg_avg_hours}")
 
-    
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,26 @@
+import contact_network
+from contact_network import ContactNetwork
+
+
+def neighbours(network, node):
+    return network.indices[network.indptr[node]:network.indptr[node + 1]].tolist()
+
+
+def test_from_edges(monkeypatch):
+    """Neighbours are listed in edge order, first where the node is the source; chunks don't change the result."""
+
+    sources, destinations = [0, 1, 2, 2, 0, 3], [1, 2, 2, 0, 1, 0]  # (2, 2) is a self-loop, (0, 1) a duplicate
+    for chunk in (2, 3, 1 << 18):
+        monkeypatch.setattr(contact_network, 'CHUNK', chunk)
+        network = ContactNetwork.from_edges(sources, destinations, n=5)
+        assert network.n == 5
+        assert [neighbours(network, node) for node in range(5)] == [[1, 1, 2, 3], [2, 0, 0], [0, 1], [0], []]
+        assert network.indices.dtype.name == 'int32'
+
+
+def test_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(contact_network, 'CHUNK', 2)
+    path = tmp_path / 'edges.txt'
+    path.write_text("# a comment\n0 1\n1 2  # another\n2 3\n3 0\n")
+    network = ContactNetwork.load(str(path))
+    assert [neighbours(network, node) for node in range(4)] == [[1, 3], [2, 0], [3, 1], [0, 2]]
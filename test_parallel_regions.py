@@ -0,0 +1,25 @@
+import os
+import random
+
+import parallel_regions
+from edit_storage import Backup
+from storage_region import build_regions
+
+MAX_T = 365 * 24 * 3600  # one year
+
+
+def test_matches_sequential_regions():
+    """Simulating each region in its own process gives the same results as simulating the regions one after the
+    other, seeded in the same way."""
+
+    with open(os.path.join(os.path.dirname(__file__), 'p2p_regions.cfg')) as f:
+        text = f.read()
+    parallel = parallel_regions.simulate(text, MAX_T, seed=1)
+
+    sequential = {}
+    regions, links = build_regions(text)
+    for region, seed in zip(regions, parallel_regions.region_seeds(regions, 1)):
+        sim = Backup(region.nodes, MAX_T, [region], links, 'local', random.Random(seed))
+        sim.run(MAX_T)
+        sequential.update(sim.region_avg_hours)
+    assert parallel == sequential
@@ -0,0 +1,33 @@
+import csv
+import io
+
+from plot_queue_w import Row, parse_rows
+
+
+def parse(text, **kwargs):
+    return list(parse_rows(csv.reader(io.StringIO(text)), **kwargs))
+
+
+def test_current_layout():
+    assert parse("0.9,1,1000.0,10,2,1.5,srpt,3.5\n") == [Row(0.9, 1.0, 1000.0, 10, 2, 1.5, 'srpt', 3.5)]
+
+
+def test_queue_sim_layout():
+    """Rows of the old queue_sim: lambd, mu, max_t, n, d, w."""
+
+    assert parse("0.9,1,1000.0,10,2,3.5\n") == [Row(0.9, 1.0, 1000.0, 10, 2, 1.0, 'fifo', 3.5)]
+
+
+def test_legacy_fifo_layout():
+    """Rows of the old weibull.py: lambd, mu, max_t, n, d, shape, w."""
+
+    expected = [Row(0.9, 1.0, 1000.0, 10, 2, 0.5, 'fifo', 3.5)]
+    assert parse("0.9,1,1000.0,10,2,0.5,3.5\n") == expected
+    assert parse("0.9,1,1000.0,10,2,0.5,3.5\n", legacy_layout='fifo') == expected
+
+
+def test_legacy_lifo_layout():
+    """Rows of the old weibull_preemptive_lifo2.py: lambd, mu, shape, n, d, max_t, w."""
+
+    assert (parse("0.9,1,0.5,10,2,1000.0,3.5\n", legacy_layout='lifo')
+            == [Row(0.9, 1.0, 1000.0, 10, 2, 0.5, 'lifo-pr', 3.5)])
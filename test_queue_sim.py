@@ -0,0 +1,12 @@
+from queue_sim import Queues, crn_streams
+
+
+def test_crn_queues_grow_with_d():
+    """With common random numbers, a job samples the same queues with d=2 as the first two with d=10."""
+
+    small = Queues(0.9, 1, 100, 2, streams=crn_streams(1))
+    large = Queues(0.9, 1, 100, 10, streams=crn_streams(1))
+    for _ in range(1000):
+        few, many = small.crn_queues(), large.crn_queues()
+        assert len(set(many)) == 10
+        assert few == many[:2]
@@ -0,0 +1,23 @@
+import argparse
+
+from queue_sweep import adaptive_sweep
+
+
+class SerialPool:
+    """Runs the tasks of a sweep in this process."""
+
+    def imap_unordered(self, function, items):
+        return map(function, items)
+
+
+def test_adaptive_sweep_keeps_curves_apart(capsys):
+    """With common random numbers, the points at lambd=0.9 of the max_t=50 and max_t=100 curves both run for the
+    relaxation max_t (100), with the same seeds: each curve must still get its own results."""
+
+    args = argparse.Namespace(lambd=[0.5, 0.9], mu=[1], max_t=[50, 100], n=[2], d=[1], shape=[1], discipline=['fifo'],
+                              replications=2, seed='0', crn='common', engine='events', no_cache=True, rounds=0,
+                              refine=1, relaxations=1)
+    rows = []
+    adaptive_sweep(SerialPool(), args, rows)
+    assert len(rows) == 8
+    assert "simulated 4 points" in capsys.readouterr().out
@@ -0,0 +1,35 @@
+import math
+import random
+import statistics
+
+import pytest
+
+from sir import simulate
+
+POPULATION, INFECTED, CONTACT_RATE, RECOVERY_RATE = 500, 5, 1, 1 / 3
+RUNS = 100
+
+
+def ensemble(engine):
+    """Final size and peak of seeded epidemics, as two lists."""
+
+    final_sizes, peaks = [], []
+    for seed in range(RUNS):
+        _, i, r = simulate(engine, POPULATION, INFECTED, CONTACT_RATE, RECOVERY_RATE, rng=random.Random(seed))
+        final_sizes.append(int(r[-1]))  # tau-leaping gives NumPy ints
+        peaks.append(int(max(i)))
+    return final_sizes, peaks
+
+
+def standard_error(values):
+    return statistics.stdev(values) / math.sqrt(len(values))
+
+
+@pytest.mark.parametrize('engine', ['gillespie', 'tau-leaping'])
+def test_aggregate_engines_match_agents(engine):
+    """Mean final size and mean peak of the aggregate engines agree with the agent-based engine within 4 standard
+    errors of their difference."""
+
+    for agent_values, values in zip(ensemble('agent'), ensemble(engine)):
+        difference = statistics.fmean(values) - statistics.fmean(agent_values)
+        assert abs(difference) < 4 * math.hypot(standard_error(values), standard_error(agent_values))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+"""Analyze an event trace written by `discrete_event_sim.EventTrace` (e.g., with the --trace option of storage.py,
+storage_region.py or queue_sim.py) without running the simulation again.
+
+The trace is memory-mapped and all statistics are computed with NumPy:
+  - event rates: number of events of each type in each time bin;
+  - transfer throughput (storage traces): bytes uploaded and downloaded by each node, whose ids are their positions in
+    the configuration file, in the order in which they are created;
+  - queue occupancy (queue traces): time-averaged length of each queue and number of jobs in the system over time.
+
+Example:
+    storage.py p2p.cfg --max-t "1 year" --seed 1 --trace p2p.trace
+    trace_analysis.py p2p.trace --bins 12 --plot
+"""
+
+import argparse
+
+import numpy as np
+
+from discrete_event_sim import EventTrace
+
+TRANSFER_EVENTS = ['BlockBackupComplete', 'BlockRestoreComplete']  # payload: uploader, downloader, bytes
+QUEUE_EVENTS = ['Arrival', 'Completion', 'JobCompletion']  # payload: queue, its length, jobs in the system
+
+
+def type_mask(records, names, selected):
+    """Boolean mask of the records whose event type is among the selected names."""
+
+    codes = [code for code, name in enumerate(names) if name in selected]
+    return np.isin(records['type'], codes)
+
+
+def event_rates(records, names, bins):
+    """Return the bin edges and {event type name: number of events in each bin}."""
+
+    edges = np.linspace(records['t'][0], records['t'][-1], bins + 1)
+    bin_indexes = np.clip(np.searchsorted(edges, records['t'], side='right') - 1, 0, bins - 1)
+    counts = np.zeros((len(names), bins), dtype=np.int64)
+    np.add.at(counts, (records['type'], bin_indexes), 1)
+    return edges, {name: counts[code] for code, name in enumerate(names)}
+
+
+def transfer_throughput(records, names):
+    """Return the bytes uploaded and downloaded by each node, as two arrays indexed by node id."""
+
+    transfers = records[type_mask(records, names, TRANSFER_EVENTS)]
+    nodes = max(transfers['a'].max(initial=-1), transfers['b'].max(initial=-1)) + 1
+    uploaded = np.bincount(transfers['a'], weights=transfers['value'], minlength=nodes)
+    downloaded = np.bincount(transfers['b'], weights=transfers['value'], minlength=nodes)
+    return uploaded, downloaded
+
+
+def queue_occupancy(records, names):
+    """Return the time-averaged length of each queue, and the (times, jobs in the system) timeline."""
+
+    events = records[type_mask(records, names, QUEUE_EVENTS)]
+    t = events['t']
+    end = t[-1] if len(t) else 0
+    # events of each queue together, in time order; each length holds from its event to the next one of the same
+    # queue (the last one up to the end of the trace), and queues start empty
+    order = np.lexsort((t, events['a']))
+    times, queue, length = t[order], events['a'][order], events['b'][order]
+    next_times = np.append(times[1:], end)
+    last = np.append(queue[1:] != queue[:-1], True)
+    next_times[last] = end
+    areas = np.bincount(queue, weights=length * (next_times - times), minlength=queue.max(initial=-1) + 1)
+    return (areas / end if end > 0 else np.zeros_like(areas)), (t, events['value'])
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('trace', help="trace file (its event names are in the .types file next to it)")
+    parser.add_argument('--bins', type=int, default=10, help="time bins for the event rates")
+    parser.add_argument('--plot', action='store_true', help="plot event rates and, for queues, jobs in the system")
+    args = parser.parse_args()
+
+    records, names = EventTrace.load(args.trace)
+    if len(records) == 0:
+        print("empty trace")
+        return
+    print(f"{len(records)} events between t={records['t'][0]:.2f} and t={records['t'][-1]:.2f}")
+
+    edges, rates = event_rates(records, names, args.bins)
+    print("events per bin:")
+    for name, counts in rates.items():
+        print(f"  {name:>22}: {' '.join(map(str, counts))}")
+
+    timeline = None
+    if any(name in TRANSFER_EVENTS for name in names):
+        uploaded, downloaded = transfer_throughput(records, names)
+        duration = records['t'][-1] - records['t'][0]
+        print("node: uploaded, downloaded bytes (average bytes/s)")
+        for node, (up, down) in enumerate(zip(uploaded, downloaded)):
+            print(f"  {node}: {up:.0f} ({up / duration:.2f}), {down:.0f} ({down / duration:.2f})")
+    if any(name in QUEUE_EVENTS for name in names):
+        averages, timeline = queue_occupancy(records, names)
+        print(f"average queue lengths: {np.round(averages, 3)}")
+        t, jobs = timeline
+        average = (jobs[:-1] * np.diff(t)).sum() / (t[-1] - t[0]) if len(t) > 1 else jobs.mean()
+        print(f"jobs in the system: time average {average:.2f}, maximum {jobs.max():.0f}")
+
+    if args.plot:
+        from matplotlib import pyplot as plt
+
+        fig, axes = plt.subplots(2 if timeline is not None else 1, squeeze=False)
+        ax = axes[0, 0]
+        for name, counts in rates.items():
+            ax.stairs(counts, edges, label=name)
+        ax.set_xlabel("Time")
+        ax.set_ylabel("Events per bin")
+        ax.legend(loc=0)
+        if timeline is not None:
+            ax = axes[1, 0]
+            ax.step(*timeline, where='post')
+            ax.set_xlabel("Time")
+            ax.set_ylabel("Jobs in the system")
+        plt.show()
+
+
+if __name__ == '__main__':
+    main()
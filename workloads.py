@@ -1,32 +1,70 @@
-import csv
-from datetime import datetime
-import gzip
 import os
 import os.path
 import functools
 import math
 import random
-from tempfile import NamedTemporaryFile
-from urllib.request import urlopen
 
 MUSTANG_URL = 'https://ftp.pdl.cmu.edu/pub/datasets/ATLAS/mustang/mustang_release_v1.0beta.csv.gz'
 
 # NOTE: if you want to shuffle a trace, have a look at the `random.shuffle` function.
 
 
-def weibull_generator(shape, mean):
-    """Returns a callable that outputs random variables with a Weibull distribution having the given shape and mean."""
+def weibull_generator(shape, mean, rng=random):
+    """Returns a callable that outputs random variables with a Weibull distribution having the given shape and mean.
 
-    return functools.partial(random.weibullvariate, mean / math.gamma(1 + 1 / shape), shape)
+    Variates are drawn from rng, a `random.Random` instance (by default, the `random` module's shared one)."""
+
+    return functools.partial(rng.weibullvariate, mean / math.gamma(1 + 1 / shape), shape)
+
+
+class Exponential:
+    """Exponentially distributed times; see `Weibull` for the interface."""
+
+    def generator(self, rate, rng=random):
+        """Returns a callable that outputs random variables with the given rate (i.e., mean 1 / rate), drawn from
+        rng."""
+        return functools.partial(rng.expovariate, rate)
+
+    def __repr__(self):
+        return 'Exponential()'
+
+
+class Weibull:
+    """Weibull-distributed times with a given shape; shape 1 is the exponential distribution."""
+
+    def __init__(self, shape):
+        self.shape = shape
+
+    def generator(self, rate, rng=random):
+        """Returns a callable that outputs random variables with the given rate (i.e., mean 1 / rate), drawn from
+        rng."""
+        return weibull_generator(self.shape, 1 / rate, rng)
+
+    def __repr__(self):
+        return f'Weibull({self.shape})'
+
+
+def distribution(shape):
+    """The distribution used for a given Weibull shape: exponential ones get the simulators' fast paths."""
+
+    return Exponential() if shape == 1 else Weibull(shape)
 
 
 def isoformat2ts(date_string):
+    from datetime import datetime
+
     return datetime.fromisoformat(date_string).timestamp()
 
 
 def parse_mustang(path=None):
     """Parses the Mustang trace and returns a list of (delay, size) pairs."""
 
+    # only needed here: the simulators import this module, and shouldn't pay for loading urllib
+    import csv
+    import gzip
+    from tempfile import NamedTemporaryFile
+    from urllib.request import urlopen
+
     if path is None:
         path = MUSTANG_URL.split('/')[-1]
     if not os.path.exists(path):